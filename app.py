@@ -5,10 +5,19 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 from modules.openai_patch import patch_openai
 import gradio as gr
 import json
+import re
 import time
 import zipfile
 import tempfile
-from pathlib import Path
+import shutil
+import hashlib
+import uuid
+import threading
+import functools
+import io
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePath
 
 # 確保可以導入專案模組
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
@@ -20,6 +29,7 @@ from modules.subtitle_corrector import SubtitleCorrector
 from modules.srt_generator import SRTGenerator
 from modules.audio_merge import AudioMerger, AudioMergeError  # 導入 AudioMerger
 from modules import TTS_VOICES, TTS_EMOTIONS
+from prompts import TEXT_PREPROCESSING_PROMPTS
 
 # 檔案路徑設置
 current_dir = Path(__file__).parent
@@ -28,12 +38,66 @@ dictionary_path = data_dir / "default_dictionary.json"
 temp_dir = current_dir / "temp" / "audio"
 subtitle_dir = current_dir / "temp" / "subtitle"
 video_dir = current_dir / "temp" / "video"  # 新增視頻目錄
+cache_dir = data_dir / "cache"  # 各步驟結果快取
 
 # 確保資料和臨時目錄存在
 os.makedirs(data_dir, exist_ok=True)
 os.makedirs(temp_dir, exist_ok=True)
 os.makedirs(subtitle_dir, exist_ok=True)
 os.makedirs(video_dir, exist_ok=True)  # 確保視頻目錄存在
+os.makedirs(cache_dir, exist_ok=True)
+
+# 同時送出的 TTS 請求數（每個段落為一個請求）
+TTS_CONCURRENCY = 3
+
+# 同時送出的 Whisper 轉錄請求數
+WHISPER_CONCURRENCY = 4
+
+# 多音字斷詞時同時送出的 Google AI 批次數
+HOMOPHONE_CONCURRENCY = 4
+
+# 字幕校正時同時送出的 Gemini 批次數
+GEMINI_CONCURRENCY = 4
+
+# 字幕目錄中下載檔與中間檔（以及音頻目錄中的處理目錄）的保留時間，以及清理的最短間隔
+SUBTITLE_FILE_TTL = 24 * 3600
+SUBTITLE_GC_INTERVAL = 3600
+_last_subtitle_gc = 0.0
+_last_audio_gc = 0.0
+
+# 各步驟快取（預處理、多音字、Whisper）的容量上限，以及淘汰掃描的最短間隔
+CACHE_STAGE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_PRUNE_INTERVAL = 3600
+_last_cache_prune = {}
+
+# 語音與情緒選項，步驟3與一鍵處理頁籤共用同一份
+_VOICE_NAMES = tuple(TTS_VOICES.keys())
+_EMOTIONS = tuple(TTS_EMOTIONS)
+
+# 批次並行時各階段同時處理的檔案數上限，依各服務的速率限制分別控制，
+# 不同檔案可以同時處於不同階段（例如一個在TTS、另一個在Whisper）
+STAGE_LIMITS = {
+    "google": threading.BoundedSemaphore(4),
+    "tts": threading.BoundedSemaphore(4),
+    "whisper": threading.BoundedSemaphore(2),
+    "gemini": threading.BoundedSemaphore(4),
+    "ffmpeg": threading.BoundedSemaphore(max(1, (os.cpu_count() or 2) // 2)),
+}
+
+# 解壓音頻時使用的複製緩衝區大小（預設的 16 KB 對 MP3 過小）
+ZIP_COPY_BUFSIZE = 4 * 1024 * 1024
+
+# 解壓的單一音頻小於此大小時只保留在記憶體中
+AUDIO_SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+# 打包整合包時的寫入緩衝區大小，以及字幕檔需要壓縮的大小門檻
+ZIP_WRITE_BUFSIZE = 4 * 1024 * 1024
+SRT_COMPRESS_THRESHOLD = 64 * 1024
+
+# 批次處理時每個檔案使用的狀態與日誌範本
+STATUS_TMPL = "檔案 {idx}/{count} ({name}): {status}"
+LOG_HEADER_TMPL = "\n{rule}\n檔案: {name}\n{rule}"
+LOG_RULE = "=" * 50
 
 # 如果字典檔案不存在，創建預設字典
 if not dictionary_path.exists():
@@ -52,6 +116,159 @@ if not dictionary_path.exists():
     except Exception as e:
         print(f"Error creating dictionary file: {e}")
 
+def _unique_stamp():
+    """產生檔名用的時間戳記，附加隨機碼避免多個檔案同時處理時檔名衝突"""
+    return f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+def _cache_key(*parts):
+    """以輸入內容與參數計算快取鍵值"""
+    joined = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+def _cache_get(stage, key):
+    """讀取指定步驟的快取結果，不存在時返回 None（命中時更新修改時間，供淘汰時判斷）"""
+    cache_file = cache_dir / stage / f"{key}.json"
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            value = json.load(f)
+        os.utime(cache_file)
+        return value
+    except (OSError, ValueError):
+        return None
+
+def _prune_cache_stage(stage_dir, now=None):
+    """步驟快取總大小超過上限時，從最久未使用的結果開始刪除，每個步驟最多每小時掃描一次"""
+    now = now or time.time()
+    stage = stage_dir.name
+    if now - _last_cache_prune.get(stage, 0.0) < CACHE_PRUNE_INTERVAL:
+        return
+    _last_cache_prune[stage] = now
+    
+    entries = []
+    total = 0
+    with os.scandir(stage_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.json') and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+    if total <= CACHE_STAGE_MAX_BYTES:
+        return
+    
+    entries.sort()
+    for _, size, path in entries:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= CACHE_STAGE_MAX_BYTES:
+            break
+
+def _cache_put(stage, key, value):
+    """寫入指定步驟的快取結果（先寫暫存檔再替換，避免產生不完整的快取）"""
+    stage_dir = cache_dir / stage
+    try:
+        os.makedirs(stage_dir, exist_ok=True)
+        tmp_file = stage_dir / f"{key}.json.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_file, stage_dir / f"{key}.json")
+        _prune_cache_stage(stage_dir)
+    except OSError as e:
+        print(f"寫入快取失敗 ({stage}): {e}")
+
+_DIGITS_RE = re.compile(r'(\d+)')
+
+def _audio_sort_key(file_name):
+    """音頻檔案的排序鍵值，依檔名中的數字排序（避免 10.mp3 排在 2.mp3 之前）"""
+    base_name = os.path.basename(file_name)
+    match = _DIGITS_RE.search(os.path.splitext(base_name)[0])
+    if match:
+        return (0, int(match.group(1)), base_name)
+    return (1, 0, base_name)
+
+def _mp3_entries(zf):
+    """列出ZIP中的MP3項目，依檔名中的數字排序"""
+    return sorted(
+        (e for e in zf.infolist() if not e.is_dir() and e.filename.endswith('.mp3')),
+        key=lambda e: _audio_sort_key(e.filename)
+    )
+
+def iter_mp3_files(audio_zip):
+    """逐一串流解壓ZIP中的MP3項目，每解壓完一個就產生其內容
+    
+    直接走訪 ZIP 目錄並只複製 MP3 項目，避免 extractall 後再掃描目錄；
+    呼叫端可以在後續項目仍在解壓時就開始處理已產生的檔案。
+    內容存放在 SpooledTemporaryFile，小於門檻時完全不寫入磁碟。
+    
+    Args:
+        audio_zip: 音頻ZIP檔案路徑
+        
+    Yields:
+        tuple: (檔名, 檔案物件)，依檔名中的數字排序；由使用端負責關閉檔案物件
+    """
+    with zipfile.ZipFile(audio_zip, 'r') as zf:
+        for entry in _mp3_entries(zf):
+            spool = tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MAX_SIZE)
+            with zf.open(entry) as src:
+                shutil.copyfileobj(src, spool, length=ZIP_COPY_BUFSIZE)
+            spool.seek(0)
+            # 只保留檔名，不使用ZIP內的路徑
+            yield os.path.basename(entry.filename), spool
+
+def _zip_audio_digest(audio_zip):
+    """以ZIP目錄中MP3項目的名稱、CRC 與大小計算內容摘要，不需解壓
+    
+    Returns:
+        str: 摘要字串，ZIP中沒有MP3時返回 None
+    """
+    with zipfile.ZipFile(audio_zip, 'r') as zf:
+        entries = _mp3_entries(zf)
+    if not entries:
+        return None
+    return _cache_key(*(f"{os.path.basename(e.filename)}:{e.CRC:08x}:{e.file_size}" for e in entries))
+
+def _dictionary_mtime():
+    """字典檔的修改時間（奈秒），檔案不存在時返回 0"""
+    try:
+        return dictionary_path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+@functools.lru_cache(maxsize=1)
+def _load_homophone_replacer(dictionary_mtime):
+    """依字典檔修改時間載入多音字替換器，修改時間不變時重用同一個實例"""
+    return HomophoneReplacer(dictionary_path)
+
+def _get_homophone_replacer():
+    """取得共用的多音字替換器，字典檔在磁碟上被修改後自動重新載入
+    
+    Returns:
+        tuple: (多音字替換器, 載入時的字典修改時間)
+    """
+    dictionary_mtime = _dictionary_mtime()
+    return _load_homophone_replacer(dictionary_mtime), dictionary_mtime
+
+@functools.lru_cache(maxsize=4)
+def _get_srt_generator(srt_temp_dir):
+    """取得共用的SRT生成器"""
+    return SRTGenerator(temp_dir=srt_temp_dir)
+
+@functools.lru_cache(maxsize=8)
+def _get_subtitle_corrector(gemini_api_key):
+    """依 API 金鑰取得共用的字幕校正器，更換金鑰時會建立新的實例"""
+    return SubtitleCorrector(gemini_api_key)
+
+def invalidate_cached_services():
+    """清除共用的處理器實例，下次使用時重新載入（例如字典檔更新後）"""
+    _load_homophone_replacer.cache_clear()
+    _get_srt_generator.cache_clear()
+    _get_subtitle_corrector.cache_clear()
+    _get_homophone_replacer()
+    APP_SERVICES.srt = _get_srt_generator(str(subtitle_dir))
+    return "已重新載入多音字字典"
+
 def process_text(input_text, language, google_api_key):
     """處理文本的回調函數"""
     try:
@@ -62,8 +279,16 @@ def process_text(input_text, language, google_api_key):
         if not google_api_key.strip():
             return "請提供 Google AI API 金鑰", None
         
+        # 相同文本、語言與提示詞的結果直接從快取讀取；修改提示詞後舊快取自動失效
+        key = _cache_key(input_text, language, TEXT_PREPROCESSING_PROMPTS.get(language))
+        processed_text = _cache_get("preproc", key)
+        if processed_text is not None:
+            return "處理成功! (使用快取)", processed_text
+        
         # 調用預處理函數
-        processed_text = preprocess_text(input_text, language, google_api_key)
+        with STAGE_LIMITS["google"]:
+            processed_text = preprocess_text(input_text, language, google_api_key)
+        _cache_put("preproc", key, processed_text)
         
         return "處理成功!", processed_text
     
@@ -81,28 +306,72 @@ def replace_homophones(processed_text, google_api_key):
         if not google_api_key.strip():
             return "請提供 Google AI API 金鑰", None, None
         
-        # 初始化多音字替換器
-        homophone_replacer = HomophoneReplacer(dictionary_path)
+        # 快取鍵值使用替換器實際載入的字典修改時間，字典更新後會重新處理
+        homophone_replacer, dictionary_mtime = _get_homophone_replacer()
+        key = _cache_key(processed_text, dictionary_mtime)
+        cached = _cache_get("homophone", key)
+        if cached is not None:
+            return "多音字替換成功! (使用快取)", cached["modified_text"], cached["report"]
         
         # 將文本分成批次（每10個段落一批）
         text_batches = homophone_replacer.segment_text(processed_text, batch_size=10)
         
         # 使用Google AI處理每個批次
-        token_text = homophone_replacer.process_with_google_ai(text_batches, google_api_key)
+        with STAGE_LIMITS["google"]:
+            token_text = homophone_replacer.process_with_google_ai(
+                text_batches, google_api_key, max_workers=HOMOPHONE_CONCURRENCY
+            )
         
         # 進行多音字替換
         modified_text, report = homophone_replacer.replace_homophones(token_text)
         
         # 生成報告
         human_readable_report = homophone_replacer.get_replacement_report(report)
+        _cache_put("homophone", key, {"modified_text": modified_text, "report": human_readable_report})
         
         return "多音字替換成功!", modified_text, human_readable_report
     
     except Exception as e:
         return f"多音字替換錯誤: {str(e)}", None, None
 
-def generate_tts(text, api_key, voice_name, emotion, speed, custom_pronunciation, progress=gr.Progress()):
-    """TTS語音生成的回調函數"""
+class _ThrottledProgress:
+    """節流的進度回調，最多每 0.1 秒或進度變化 1% 才轉發一次更新
+    
+    每次 progress() 都會經由 websocket 傳到瀏覽器，TTS 與批次處理的逐段回報
+    在高並行時會佔滿事件迴圈；完成（1.0）的更新一律轉發。
+    """
+    __slots__ = ('progress', 'last_time', 'last_value')
+    
+    MIN_INTERVAL = 0.1
+    MIN_DELTA = 0.01
+    
+    def __init__(self, progress):
+        self.progress = progress
+        self.last_time = 0.0
+        self.last_value = -1.0
+    
+    def __call__(self, value, desc=""):
+        now = time.monotonic()
+        if (value < 1.0 and now - self.last_time < self.MIN_INTERVAL
+                and abs(value - self.last_value) < self.MIN_DELTA):
+            return
+        self.last_time = now
+        self.last_value = value
+        self.progress(value, desc)
+
+def _throttled(progress):
+    """將進度回調包裝為節流版本，已包裝者直接返回"""
+    if isinstance(progress, _ThrottledProgress):
+        return progress
+    return _ThrottledProgress(progress)
+
+def generate_tts(text, api_key, voice_name, emotion, speed, custom_pronunciation, progress=gr.Progress(), output_dir=None):
+    """TTS語音生成的回調函數
+    
+    output_dir 未指定時為這次呼叫建立獨立的音頻目錄（超過保留時間後由 _gc_audio_dir 清理），
+    並行的請求才不會刪除或覆蓋彼此的音頻。
+    """
+    progress = _throttled(progress)
     try:
         if not text or not text.strip():
             return "請先完成多音字替換", None, None, None, None
@@ -110,18 +379,26 @@ def generate_tts(text, api_key, voice_name, emotion, speed, custom_pronunciation
         if not api_key.strip():
             return "請提供 Hailuo API 金鑰", None, None, None, None
         
+        # 已合成過的段落由 TTSGenerator 的語音快取取回，這裡不另外快取整組音頻
+        if not output_dir:
+            _gc_audio_dir()
+            output_dir = tempfile.mkdtemp(prefix="run_", dir=temp_dir)
+        output_dir = Path(output_dir)
+        
         # 初始化TTS生成器 (使用默認 group_id="1886392350196895842")
-        tts_generator = TTSGenerator(api_key, output_dir=temp_dir)
+        tts_generator = APP_SERVICES.tts_factory(api_key, output_dir=output_dir)
         
         # 生成語音
-        mp3_files, zip_path = tts_generator.generate_speech(
-            text,
-            voice_name=voice_name,
-            emotion=emotion,
-            speed=float(speed),
-            custom_pronunciation=custom_pronunciation,
-            progress_callback=lambda p: progress(p/100) # Gradio進度條需要0-1之間的值
-        )
+        with STAGE_LIMITS["tts"]:
+            mp3_files, zip_path = tts_generator.generate_speech(
+                text,
+                voice_name=voice_name,
+                emotion=emotion,
+                speed=float(speed),
+                custom_pronunciation=custom_pronunciation,
+                progress_callback=lambda p: progress(p/100), # Gradio進度條需要0-1之間的值
+                max_workers=TTS_CONCURRENCY
+            )
         
         # 生成語音文件列表 (mp3_files現在是字符串列表)
         file_list = ""
@@ -129,24 +406,53 @@ def generate_tts(text, api_key, voice_name, emotion, speed, custom_pronunciation
             file_name = os.path.basename(file_path)
             file_list += f"{i+1}. {file_name}\n"
         
-        # 生成逐字稿文件
-        timestamp = int(time.time())
-        transcript_file = str(subtitle_dir / f"transcript_{timestamp}.txt")
-        
-        # 保存純文本作為逐字稿
-        with open(transcript_file, "w", encoding="utf-8") as f:
-            f.write(text)
-        
-        return "語音生成成功!", file_list, zip_path, transcript_file, mp3_files
+        # 逐字稿文本直接返回，只有下載時才寫入檔案
+        return "語音生成成功!", file_list, zip_path, text, mp3_files
     
     except TTSGenerationError as e:
         return f"語音生成錯誤: {str(e)}", None, None, None, None
     except Exception as e:
         return f"未知錯誤: {str(e)}", None, None, None, None
 
+def _srt_to_bytes(subs):
+    """將 pysrt 字幕序列化為 UTF-8 位元組，以便一次寫入檔案"""
+    buffer = io.StringIO()
+    subs.write_into(buffer, eol="\n")
+    return buffer.getvalue().encode("utf-8")
+
+def _transcribe_with_cache(srt_generator, audio_zip, audio_digest, output_file, api_key, language):
+    """從音頻ZIP轉錄字幕，並以音頻內容為鍵值快取 Whisper 轉錄結果
+    
+    未命中快取時邊解壓邊送出轉錄，第一個音頻不必等待整個ZIP解壓完成。
+    output_file 為 None 時只返回SRT內容，不寫入檔案。
+    
+    Returns:
+        (成功狀態, SRT檔案路徑或錯誤訊息, SRT內容)
+    """
+    key = _cache_key(audio_digest, language)
+    cached_srt = _cache_get("whisper", key)
+    if cached_srt is not None:
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(cached_srt)
+        return True, output_file, cached_srt
+    
+    with STAGE_LIMITS["whisper"]:
+        success, srt_path, srt_text = srt_generator.generate_srt_from_audio_files(
+            iter_mp3_files(audio_zip),
+            output_file,
+            api_key,
+            language,
+            max_workers=WHISPER_CONCURRENCY
+        )
+    if success:
+        _cache_put("whisper", key, srt_text)
+    return success, srt_path, srt_text
+
 # 新增函數：僅生成字幕，不進行校正
 def generate_subtitle_only(audio_zip, whisper_api_key, language, progress=gr.Progress()):
     """只從音頻生成字幕的回調函數，不進行校正"""
+    progress = _throttled(progress)
     try:
         if not audio_zip or not os.path.exists(audio_zip):
             return "請先上傳音頻文件", None, None
@@ -154,32 +460,25 @@ def generate_subtitle_only(audio_zip, whisper_api_key, language, progress=gr.Pro
         if not whisper_api_key.strip():
             return "請提供 Whisper API 金鑰", None, None
         
-        timestamp = int(time.time())
-        progress(0.1, "解壓音頻文件...")
-        
-        # 創建臨時目錄解壓音頻文件
-        extract_dir = tempfile.mkdtemp()
+        progress(0.1, "讀取音頻文件...")
         
-        # 解壓ZIP文件
-        with zipfile.ZipFile(audio_zip, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
+        # 只讀取ZIP目錄，MP3會在轉錄時逐一解壓
+        audio_digest = _zip_audio_digest(audio_zip)
         
-        # 獲取所有MP3文件
-        audio_files = sorted([os.path.join(extract_dir, f) for f in os.listdir(extract_dir) if f.endswith('.mp3')])
-        
-        if not audio_files:
+        if not audio_digest:
             return "未在ZIP文件中找到MP3音頻", None, None
         
         progress(0.3, "使用Whisper API生成字幕...")
         
         # 使用SRTGenerator從音頻文件生成SRT
-        srt_generator = SRTGenerator(temp_dir=str(subtitle_dir))
-        initial_srt_path = str(subtitle_dir / f"initial_srt_{timestamp}.srt")
+        srt_generator = APP_SERVICES.srt
         
-        # 使用Whisper API轉錄
-        success, srt_path = srt_generator.generate_srt_from_audio_files(
-            audio_files,
-            initial_srt_path,
+        # 使用Whisper API轉錄，原始字幕只保留在記憶體中
+        success, srt_path, srt_content = _transcribe_with_cache(
+            srt_generator,
+            audio_zip,
+            audio_digest,
+            None,
             whisper_api_key,
             language
         )
@@ -187,13 +486,9 @@ def generate_subtitle_only(audio_zip, whisper_api_key, language, progress=gr.Pro
         if not success:
             return f"字幕生成失敗: {srt_path}", None, None
         
-        # 讀取生成的SRT內容
-        with open(initial_srt_path, 'r', encoding='utf-8') as f:
-            srt_content = f.read()
-        
         progress(1.0, "完成!")
         
-        return "字幕生成成功!", srt_content, initial_srt_path
+        return "字幕生成成功!", srt_content, srt_content
     
     except Exception as e:
         return f"字幕生成過程中出錯: {str(e)}", None, None
@@ -201,6 +496,7 @@ def generate_subtitle_only(audio_zip, whisper_api_key, language, progress=gr.Pro
 def auto_process_all(transcript_file_path, google_api_key, tts_api_key, whisper_api_key, gemini_api_key, 
                     language, voice_name, emotion, speed, custom_pronunciation, batch_size, progress=gr.Progress()):
     """一鍵處理所有步驟的整合函數"""
+    progress = _throttled(progress)
     try:
         # 檢查必要參數
         if not transcript_file_path or not os.path.exists(transcript_file_path):
@@ -249,24 +545,27 @@ def auto_process_all(transcript_file_path, google_api_key, tts_api_key, whisper_
         # 步驟3: TTS語音生成
         progress(0.5, "步驟3: TTS語音生成...")
         log_messages.append("\n=== 步驟3: TTS語音生成 ===")
-        status_msg, file_list, zip_path, transcript_file, mp3_files = generate_tts(
-            modified_text, tts_api_key, voice_name, emotion, speed, custom_pronunciation
-        )
-        
-        if not zip_path or not os.path.exists(zip_path):
-            return f"語音生成失敗: {status_msg}", "\n".join(log_messages), None, None
-        
-        # 重命名ZIP檔案，使用原始檔案名稱
-        new_zip_path = os.path.join(os.path.dirname(zip_path), f"{base_filename}.zip")
+        # 每個檔案使用獨立的音頻目錄，批次並行處理時才不會互相覆蓋；
+        # 之後的步驟只需要ZIP，取出ZIP後即刪除整個目錄（含所有MP3）
+        _gc_audio_dir()
+        run_audio_dir = tempfile.mkdtemp(prefix="run_", dir=temp_dir)
         try:
-            # 如果同名檔案已存在，先刪除
-            if os.path.exists(new_zip_path):
-                os.remove(new_zip_path)
-            os.rename(zip_path, new_zip_path)
+            status_msg, file_list, zip_path, transcript_text, mp3_files = generate_tts(
+                modified_text, tts_api_key, voice_name, emotion, speed, custom_pronunciation,
+                output_dir=run_audio_dir
+            )
+            
+            if not zip_path or not os.path.exists(zip_path):
+                return f"語音生成失敗: {status_msg}", "\n".join(log_messages), None, None
+            
+            # 將ZIP移到獨立的結果目錄並使用原始檔案名稱
+            result_dir = tempfile.mkdtemp(prefix="result_", dir=temp_dir)
+            new_zip_path = os.path.join(result_dir, f"{base_filename}.zip")
+            os.replace(zip_path, new_zip_path)
             zip_path = new_zip_path
             log_messages.append(f"重命名音頻ZIP檔案為: {os.path.basename(new_zip_path)}")
-        except Exception as e:
-            log_messages.append(f"警告: 無法重命名ZIP檔案: {str(e)}")
+        finally:
+            shutil.rmtree(run_audio_dir, ignore_errors=True)
         
         log_messages.append(f"語音生成狀態: {status_msg}")
         log_messages.append(f"生成了 {len(mp3_files)} 個音頻文件")
@@ -274,20 +573,18 @@ def auto_process_all(transcript_file_path, google_api_key, tts_api_key, whisper_
         # 步驟4: 字幕生成與校正
         progress(0.8, "步驟4: 字幕生成與校正...")
         log_messages.append("\n=== 步驟4: 字幕生成與校正 ===")
-        status_msg, subtitle_file, report_file, initial_srt_file = generate_subtitle(
-            zip_path, transcript_file, whisper_api_key, gemini_api_key, language, batch_size
+        status_msg, subtitle_file, report_file, initial_srt_content = generate_subtitle(
+            zip_path, transcript_text, whisper_api_key, gemini_api_key, language, batch_size
         )
         
         if not subtitle_file or not os.path.exists(subtitle_file):
             return f"字幕生成與校正失敗: {status_msg}", "\n".join(log_messages), zip_path, None
         
-        # 重命名SRT檔案，使用原始檔案名稱
-        new_srt_path = os.path.join(os.path.dirname(subtitle_file), f"{base_filename}.srt")
+        # 重命名SRT檔案，使用原始檔案名稱，與音頻ZIP放在同一個結果目錄
+        new_srt_path = os.path.join(result_dir, f"{base_filename}.srt")
         try:
-            # 如果同名檔案已存在，先刪除
-            if os.path.exists(new_srt_path):
-                os.remove(new_srt_path)
-            os.rename(subtitle_file, new_srt_path)
+            # os.replace 會直接覆蓋同名檔案
+            os.replace(subtitle_file, new_srt_path)
             subtitle_file = new_srt_path
             log_messages.append(f"重命名字幕檔案為: {os.path.basename(new_srt_path)}")
         except Exception as e:
@@ -307,62 +604,71 @@ def auto_process_all(transcript_file_path, google_api_key, tts_api_key, whisper_
         return error_msg, "處理出錯，請查看狀態信息", None, None
 
 # 修改後的校正字幕函數
-def correct_subtitles_only(transcript_file, initial_srt_file, gemini_api_key, batch_size, progress=gr.Progress()):
-    """僅執行字幕校正部分"""
+def correct_subtitles_only(transcript_text, initial_srt_text, gemini_api_key, batch_size, progress=gr.Progress()):
+    """僅執行字幕校正部分
+    
+    逐字稿與原始字幕都以文字傳入，校正後的字幕也以文字返回，
+    只有使用者下載時才寫入檔案。
+    
+    Returns:
+        (狀態訊息, 校正後字幕內容, 校正報告檔案路徑)
+    """
+    progress = _throttled(progress)
     try:
-        if not transcript_file or not os.path.exists(transcript_file):
-            return "找不到逐字稿文件", None, None, None
+        if not transcript_text or not transcript_text.strip():
+            return "找不到逐字稿內容", None, None
         
-        if not initial_srt_file or not os.path.exists(initial_srt_file):
-            return "找不到原始字幕文件", None, None, None
+        if not initial_srt_text or not initial_srt_text.strip():
+            return "找不到原始字幕內容", None, None
         
         if not gemini_api_key.strip():
-            return "請提供 Google Gemini API 金鑰", None, None, None
+            return "請提供 Google Gemini API 金鑰", None, None
         
-        timestamp = int(time.time())
-        progress(0.2, "讀取文件...")
+        timestamp = _unique_stamp()
         
         # 使用SubtitleCorrector校正字幕
         progress(0.4, "校正字幕中...")
-        subtitle_corrector = SubtitleCorrector(gemini_api_key)
-        error, corrected_srt, reports = subtitle_corrector.correct_subtitles(
-            transcript_file,
-            initial_srt_file,
-            int(batch_size)
-        )
+        subtitle_corrector = _get_subtitle_corrector(gemini_api_key)
+        with STAGE_LIMITS["gemini"]:
+            error, corrected_srt, reports = subtitle_corrector.correct_subtitles(
+                None,
+                None,
+                int(batch_size),
+                transcript_text=transcript_text,
+                srt_text=initial_srt_text,
+                max_workers=GEMINI_CONCURRENCY
+            )
         
         if error:
-            return f"字幕校正失敗: {error}", None, None, None
+            return f"字幕校正失敗: {error}", None, None
         
-        # 保存校正後的字幕
         progress(0.8, "保存結果...")
-        corrected_srt_file = str(subtitle_dir / f"corrected_srt_{timestamp}.srt")
-        corrected_srt.save(corrected_srt_file, encoding="utf-8")
+        corrected_content = _srt_to_bytes(corrected_srt).decode("utf-8")
         
         # 保存修改報告
         report_file = str(subtitle_dir / f"correction_report_{timestamp}.txt")
-        with open(report_file, "w", encoding="utf-8") as f:
-            f.write("\n".join(reports) if reports else "沒有進行任何修改")
-        
-        # 讀取校正後的字幕內容
-        with open(corrected_srt_file, "r", encoding="utf-8") as f:
-            corrected_content = f.read()
+        Path(report_file).write_bytes(("\n".join(reports) if reports else "沒有進行任何修改").encode("utf-8"))
         
         progress(1.0, "完成!")
         
-        return "字幕校正成功!", corrected_content, corrected_srt_file, report_file
+        return "字幕校正成功!", corrected_content, report_file
     
     except Exception as e:
-        return f"字幕校正過程中出錯: {str(e)}", None, None, None
+        return f"字幕校正過程中出錯: {str(e)}", None, None
 
-def generate_subtitle(audio_zip, transcript_file, whisper_api_key, gemini_api_key, language, batch_size, progress=gr.Progress()):
-    """從音頻和逐字稿生成和校正字幕的回調函數"""
+def generate_subtitle(audio_zip, transcript_text, whisper_api_key, gemini_api_key, language, batch_size, progress=gr.Progress()):
+    """從音頻和逐字稿生成和校正字幕的回調函數
+    
+    Returns:
+        (狀態訊息, 校正後字幕檔案路徑, 校正報告檔案路徑, 原始字幕內容)
+    """
+    progress = _throttled(progress)
     try:
         if not audio_zip or not os.path.exists(audio_zip):
             return "請先生成音頻文件", None, None, None
         
-        if not transcript_file or not os.path.exists(transcript_file):
-            return "找不到逐字稿文件", None, None, None
+        if not transcript_text or not transcript_text.strip():
+            return "找不到逐字稿內容", None, None, None
         
         if not whisper_api_key.strip():
             return "請提供 Whisper API 金鑰", None, None, None
@@ -370,32 +676,26 @@ def generate_subtitle(audio_zip, transcript_file, whisper_api_key, gemini_api_ke
         if not gemini_api_key.strip():
             return "請提供 Google Gemini API 金鑰", None, None, None
         
-        timestamp = int(time.time())
-        progress(0.1, "解壓音頻文件...")
-        
-        # 創建臨時目錄解壓音頻文件
-        extract_dir = tempfile.mkdtemp()
+        timestamp = _unique_stamp()
+        progress(0.1, "讀取音頻文件...")
         
-        # 解壓ZIP文件
-        with zipfile.ZipFile(audio_zip, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
+        # 只讀取ZIP目錄，MP3會在轉錄時逐一解壓
+        audio_digest = _zip_audio_digest(audio_zip)
         
-        # 獲取所有MP3文件
-        audio_files = sorted([os.path.join(extract_dir, f) for f in os.listdir(extract_dir) if f.endswith('.mp3')])
-        
-        if not audio_files:
+        if not audio_digest:
             return "未在ZIP文件中找到MP3音頻", None, None, None
         
         progress(0.3, "使用Whisper API生成字幕...")
         
         # 使用SRTGenerator從音頻文件生成SRT
-        srt_generator = SRTGenerator(temp_dir=str(subtitle_dir))
-        initial_srt_path = str(subtitle_dir / f"initial_srt_{timestamp}.srt")
+        srt_generator = APP_SERVICES.srt
         
-        # 使用Whisper API轉錄
-        success, srt_path = srt_generator.generate_srt_from_audio_files(
-            audio_files,
-            initial_srt_path,
+        # 使用Whisper API轉錄，原始字幕直接在記憶體中交給校正步驟
+        success, srt_path, srt_content = _transcribe_with_cache(
+            srt_generator,
+            audio_zip,
+            audio_digest,
+            None,
             whisper_api_key,
             language
         )
@@ -406,32 +706,50 @@ def generate_subtitle(audio_zip, transcript_file, whisper_api_key, gemini_api_ke
         progress(0.6, "校正字幕中...")
         
         # 使用SubtitleCorrector校正字幕
-        subtitle_corrector = SubtitleCorrector(gemini_api_key)
-        error, corrected_srt, reports = subtitle_corrector.correct_subtitles(
-            transcript_file,
-            initial_srt_path,
-            int(batch_size)
-        )
+        subtitle_corrector = _get_subtitle_corrector(gemini_api_key)
+        with STAGE_LIMITS["gemini"]:
+            error, corrected_srt, reports = subtitle_corrector.correct_subtitles(
+                None,
+                None,
+                int(batch_size),
+                transcript_text=transcript_text,
+                srt_text=srt_content,
+                max_workers=GEMINI_CONCURRENCY
+            )
         
         if error:
             return f"字幕校正失敗: {error}", None, None, None
         
         # 保存校正後的字幕
         corrected_srt_file = str(subtitle_dir / f"corrected_srt_{timestamp}.srt")
-        corrected_srt.save(corrected_srt_file, encoding="utf-8")
+        Path(corrected_srt_file).write_bytes(_srt_to_bytes(corrected_srt))
         
         # 保存修改報告
         report_file = str(subtitle_dir / f"correction_report_{timestamp}.txt")
-        with open(report_file, "w", encoding="utf-8") as f:
-            f.write("\n".join(reports) if reports else "沒有進行任何修改")
+        Path(report_file).write_bytes(("\n".join(reports) if reports else "沒有進行任何修改").encode("utf-8"))
         
         progress(1.0, "完成!")
         
-        return "字幕生成與校正成功!", corrected_srt_file, report_file, initial_srt_path
+        return "字幕生成與校正成功!", corrected_srt_file, report_file, srt_content
     
     except Exception as e:
         return f"字幕生成過程中出錯: {str(e)}", None, None, None
 
+@functools.lru_cache(maxsize=64)
+def _read_cached(path, mtime_ns, size):
+    """讀取文字檔，以 (路徑, 修改時間, 大小) 為鍵值快取，檔案變更後自動失效"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _read_text_file(path):
+    """讀取文字檔，優先使用快取"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return _read_cached(path, st.st_mtime_ns, st.st_size)
+
 # 新增函數：顯示逐字稿內容
 def load_transcript(transcript_file):
     """載入並顯示逐字稿內容"""
@@ -439,9 +757,7 @@ def load_transcript(transcript_file):
         return "無法載入逐字稿文件"
     
     try:
-        with open(transcript_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
+        return _read_text_file(transcript_file)
     except Exception as e:
         return f"載入逐字稿錯誤: {str(e)}"
 
@@ -452,9 +768,7 @@ def load_srt_content(srt_file):
         return "無法載入SRT文件"
     
     try:
-        with open(srt_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
+        return _read_text_file(srt_file)
     except Exception as e:
         return f"載入SRT文件錯誤: {str(e)}"
 
@@ -466,44 +780,111 @@ def update_previews(status, subtitle_file, correction_report, initial_srt_file):
     
     return status, initial_content, corrected_content, subtitle_file, correction_report, initial_srt_file
 
+def _gc_subtitle_dir(now=None):
+    """刪除字幕目錄中超過保留時間的檔案，每小時最多掃描一次"""
+    global _last_subtitle_gc
+    now = now or time.time()
+    if now - _last_subtitle_gc < SUBTITLE_GC_INTERVAL:
+        return
+    _last_subtitle_gc = now
+    
+    cutoff = now - SUBTITLE_FILE_TTL
+    with os.scandir(subtitle_dir) as it:
+        for entry in it:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+def _gc_audio_dir(now=None):
+    """刪除音頻目錄中超過保留時間的處理目錄（run_*、result_*），每小時最多掃描一次"""
+    global _last_audio_gc
+    now = now or time.time()
+    if now - _last_audio_gc < SUBTITLE_GC_INTERVAL:
+        return
+    _last_audio_gc = now
+    
+    cutoff = now - SUBTITLE_FILE_TTL
+    with os.scandir(temp_dir) as it:
+        for entry in it:
+            try:
+                if (entry.name.startswith(("run_", "result_")) and entry.is_dir()
+                        and entry.stat().st_mtime < cutoff):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
+
+def _write_download_file(prefix, suffix, content):
+    """將記憶體中的文字寫入字幕目錄供下載，返回檔案路徑
+    
+    檔名由內容雜湊決定，相同內容重複下載時不再寫入。
+    """
+    data = content.encode("utf-8")
+    digest = hashlib.blake2b(data, digest_size=12).hexdigest()
+    file_path = subtitle_dir / f"{prefix}_{digest}{suffix}"
+    if not file_path.exists():
+        _gc_subtitle_dir()
+        tmp_path = file_path.with_name(f"{file_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, file_path)
+    return str(file_path)
+
 # 新增函數：下載校正後字幕
-def download_corrected_srt(subtitle_file):
-    """返回校正後的字幕文件以供下載"""
-    return subtitle_file
+def download_corrected_srt(corrected_srt_text):
+    """將校正後的字幕寫入檔案以供下載，尚未校正時不返回檔案"""
+    if not corrected_srt_text:
+        return None
+    return _write_download_file("corrected_srt", ".srt", corrected_srt_text)
+
+def download_transcript(transcript_text):
+    """將逐字稿寫入檔案以供下載，尚未生成時不返回檔案"""
+    if not transcript_text:
+        return None
+    return _write_download_file("transcript", ".txt", transcript_text)
+
+def _all_files_exist(file_paths):
+    """檢查所有檔案是否存在，每個目錄只列舉一次而非逐一 stat"""
+    listings = {}
+    for file_path in file_paths:
+        directory, name = os.path.split(os.path.abspath(file_path))
+        if directory not in listings:
+            try:
+                with os.scandir(directory) as it:
+                    listings[directory] = {entry.name for entry in it if entry.is_file()}
+            except OSError:
+                return False
+        if name not in listings[directory]:
+            return False
+    return True
 
 # 新增函數：創建視頻預覽
 def create_video_preview(mp3_files, subtitle_file, progress=gr.Progress()):
     """從音頻文件和字幕文件創建視頻預覽"""
+    progress = _throttled(progress)
     try:
-        if not mp3_files or not all(os.path.exists(f) for f in mp3_files):
+        if not mp3_files or not _all_files_exist(mp3_files):
             return "找不到音頻文件", None
         
         if not subtitle_file or not os.path.exists(subtitle_file):
             return "找不到字幕文件", None
         
-        timestamp = int(time.time())
-        progress(0.1, "初始化音頻合併...")
+        timestamp = _unique_stamp()
+        progress(0.1, "初始化視頻合成...")
         
         # 初始化音頻合併器
-        audio_merger = AudioMerger(output_dir=str(temp_dir))
-        
-        # 合併所有音頻文件
-        progress(0.3, "合併音頻文件...")
-        merged_audio = str(temp_dir / f"merged_audio_{timestamp}.mp3")
-        success, merged_audio_path = audio_merger.merge_audio_files(mp3_files, merged_audio)
-        
-        if not success:
-            return f"音頻合併失敗: {merged_audio_path}", None
+        audio_merger = APP_SERVICES.audio_merger
         
-        progress(0.5, "創建視頻...")
+        progress(0.3, "創建視頻...")
         
-        # 使用FFmpeg創建視頻
+        # 使用FFmpeg一次完成音頻串接、黑色背景與字幕燒入，不產生中間音頻檔
         video_output = str(video_dir / f"preview_video_{timestamp}.mp4")
-        success, video_path = audio_merger.create_video_with_subtitles(
-            merged_audio_path,
-            subtitle_file,
-            video_output
-        )
+        with STAGE_LIMITS["ffmpeg"]:
+            success, video_path = audio_merger.create_video_with_subtitles(
+                list(mp3_files),
+                subtitle_file,
+                video_output
+            )
         
         if not success:
             return f"視頻創建失敗: {video_path}", None
@@ -517,9 +898,50 @@ def create_video_preview(mp3_files, subtitle_file, progress=gr.Progress()):
     except Exception as e:
         return f"未知錯誤: {str(e)}", None
 
+def _add_file_to_zip(zf, file_path, compress_type=zipfile.ZIP_STORED):
+    """以大緩衝區將檔案串流寫入ZIP（保留原始檔名）"""
+    info = zipfile.ZipInfo.from_file(file_path, os.path.basename(file_path))
+    info.compress_type = compress_type
+    with open(file_path, 'rb') as src, zf.open(info, 'w', force_zip64=True) as dst:
+        shutil.copyfileobj(src, dst, length=ZIP_COPY_BUFSIZE)
+
+class _BatchProgress:
+    """合併多個檔案的進度，每個檔案佔整體進度的 1/file_count"""
+    __slots__ = ('outer', 'values', 'total', 'count', 'lock')
+    
+    def __init__(self, outer, count):
+        self.outer = outer
+        self.values = [0.0] * count
+        self.total = 0.0
+        self.count = count
+        self.lock = threading.Lock()
+    
+    def update(self, idx, value, desc):
+        with self.lock:
+            self.total += value - self.values[idx]
+            self.values[idx] = value
+            self.outer(self.total / self.count, desc)
+
+class _RangedProgress:
+    """單一檔案的進度回調，將 0-1 的進度回報到批次整體進度"""
+    __slots__ = ('batch', 'idx', 'prefix')
+    
+    def __init__(self, batch, idx, prefix):
+        self.batch = batch
+        self.idx = idx
+        self.prefix = prefix
+    
+    def __call__(self, value, desc=""):
+        self.batch.update(self.idx, value, f"{self.prefix} {desc}")
+
 def batch_process_all_files(transcript_files, google_api_key, tts_api_key, whisper_api_key, gemini_api_key, 
-                          language, voice_name, emotion, speed, custom_pronunciation, batch_size, progress=gr.Progress()):
-    """批次處理多個逐字稿檔案，每個檔案獨立處理並打包"""
+                          language, voice_name, emotion, speed, custom_pronunciation, batch_size,
+                          file_concurrency=1, progress=gr.Progress()):
+    """批次處理多個逐字稿檔案，每個檔案獨立處理並打包
+    
+    最多同時處理 file_concurrency 個檔案，結果仍依上傳順序整理。
+    """
+    progress = _throttled(progress)
     if not transcript_files:
         return "請上傳至少一個逐字稿檔案", "未處理任何檔案", None
     
@@ -534,68 +956,93 @@ def batch_process_all_files(transcript_files, google_api_key, tts_api_key, whisp
     # 計算總進度基準
     file_count = len(transcript_files)
     
-    # 處理每個檔案
-    for idx, file_path in enumerate(transcript_files):
-        # 計算此檔案的進度範圍
-        progress_start = idx / file_count
-        progress_end = (idx + 1) / file_count
-        
-        # 檔案處理的進度包裝器
-        def file_progress(value, desc=""):
-            overall_progress = progress_start + (progress_end - progress_start) * value
-            progress(overall_progress, f"[{idx+1}/{file_count}] {desc}")
-        
-        # 處理單一檔案
-        file_status, file_log, zip_file, srt_file = auto_process_all(
+    # 各檔案的進度由多個執行緒更新後合併為整體進度
+    batch_progress = _BatchProgress(progress, file_count)
+    
+    # 整合包放在這次批次獨立的目錄，同時執行的批次即使檔名相同也不會互相覆蓋
+    _gc_audio_dir()
+    batch_dir = Path(tempfile.mkdtemp(prefix="result_", dir=temp_dir))
+    
+    def process_one(idx, file_path):
+        """處理單一檔案"""
+        return auto_process_all(
             file_path, google_api_key, tts_api_key, whisper_api_key, gemini_api_key,
             language, voice_name, emotion, speed, custom_pronunciation, batch_size,
-            progress=file_progress
+            progress=_RangedProgress(batch_progress, idx, f"[{idx+1}/{file_count}]")
         )
+    
+    # 同時處理多個檔案
+    with ThreadPoolExecutor(max_workers=max(1, int(file_concurrency))) as executor:
+        futures = [
+            executor.submit(process_one, idx, file_path)
+            for idx, file_path in enumerate(transcript_files)
+        ]
         
-        # 記錄處理結果
-        file_name = os.path.basename(file_path)
-        base_name = os.path.splitext(file_name)[0]
-        status_messages.append(f"檔案 {idx+1}/{file_count} ({file_name}): {file_status}")
-        log_messages.append(f"\n{'='*50}\n檔案: {file_name}\n{'='*50}")
-        log_messages.append(file_log)
-        
-        # 為每個檔案創建獨立的整合包
-        if (zip_file and os.path.exists(zip_file)) and (srt_file and os.path.exists(srt_file)):
-            # 創建整合包
-            package_zip = str(temp_dir / f"整合_{base_name}.zip")
+        # 依上傳順序取回結果
+        for idx, (file_path, future) in enumerate(zip(transcript_files, futures)):
+            file_status, file_log, zip_file, srt_file = future.result()
+            
+            # 記錄處理結果
+            source = PurePath(file_path)
+            file_name = source.name
+            status_messages.append(STATUS_TMPL.format(idx=idx + 1, count=file_count, name=file_name, status=file_status))
+            log_messages.append(LOG_HEADER_TMPL.format(rule=LOG_RULE, name=file_name))
+            log_messages.append(file_log)
             
-            # 如果同名檔案已存在，先刪除
-            if os.path.exists(package_zip):
-                os.remove(package_zip)
+            # 為每個檔案創建獨立的整合包
+            zip_path = Path(zip_file) if zip_file else None
+            srt_path = Path(srt_file) if srt_file else None
+            if zip_path and zip_path.exists() and srt_path and srt_path.exists():
+                # 創建整合包
+                package_name = f"整合_{source.stem}.zip"
+                package_zip = batch_dir / package_name
                 
-            with zipfile.ZipFile(package_zip, 'w') as package:
-                # 添加音頻ZIP檔案（保留原始檔名）
-                package.write(zip_file, os.path.basename(zip_file))
-                # 添加SRT字幕檔案（保留原始檔名）
-                package.write(srt_file, os.path.basename(srt_file))
+                # 音頻ZIP已是壓縮資料，直接以 ZIP_STORED 存放並使用大緩衝區寫入
+                with open(package_zip, 'wb', buffering=ZIP_WRITE_BUFSIZE) as package_fh, \
+                        zipfile.ZipFile(package_fh, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as package:
+                    # 添加音頻ZIP檔案（保留原始檔名）
+                    _add_file_to_zip(package, zip_path)
+                    # 添加SRT字幕檔案（保留原始檔名），僅在較大時才壓縮
+                    srt_compression = zipfile.ZIP_DEFLATED if srt_path.stat().st_size > SRT_COMPRESS_THRESHOLD else zipfile.ZIP_STORED
+                    _add_file_to_zip(package, srt_path, compress_type=srt_compression)
+                
+                all_package_files.append(package_zip)
+                log_messages.append(f"已創建整合包: {package_name}")
             
-            all_package_files.append(package_zip)
-            log_messages.append(f"已創建整合包: 整合_{base_name}.zip")
+            # 音頻ZIP已放入整合包，刪除其結果目錄
+            if zip_path and zip_path.parent.name.startswith("result_"):
+                shutil.rmtree(zip_path.parent, ignore_errors=True)
     
     # 合併所有檔案處理狀態
     final_status = f"處理完成: {len(all_package_files)}/{file_count} 個檔案成功生成整合包"
     combined_logs = "\n".join(log_messages)
     
     # 創建所有整合包的索引ZIP
-    timestamp = int(time.time())
-    index_zip = str(temp_dir / f"所有整合包_{timestamp}.zip")
+    timestamp = _unique_stamp()
+    index_zip = str(batch_dir / f"所有整合包_{timestamp}.zip")
     
-    with zipfile.ZipFile(index_zip, 'w') as index_package:
+    # 整合包本身已是ZIP，不再重複壓縮
+    with open(index_zip, 'wb', buffering=ZIP_WRITE_BUFSIZE) as index_fh, \
+            zipfile.ZipFile(index_fh, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as index_package:
         for package_file in all_package_files:
-            index_package.write(package_file, os.path.basename(package_file))
+            _add_file_to_zip(index_package, package_file)
              
     return final_status, combined_logs, index_zip
 
 
 
+# 啟動時預先載入多音字字典，並建立各回調共用的處理器，避免每次請求重新建構
+_get_homophone_replacer()
+APP_SERVICES = SimpleNamespace(
+    srt=_get_srt_generator(str(subtitle_dir)),
+    tts_factory=functools.partial(TTSGenerator, output_dir=temp_dir),
+    audio_merger=AudioMerger(output_dir=str(temp_dir))
+)
+
 # 定義Gradio界面
 with gr.Blocks(
     title="AI語音生成與字幕系統",
+    analytics_enabled=False,
     css="""
     .wrap-text textarea {
         white-space: pre-wrap !important;
@@ -611,6 +1058,12 @@ with gr.Blocks(
     preprocessed_text_state = gr.State("")
     # 創建一個共享的狀態變量來存儲步驟3生成的 MP3 檔案
     mp3_files_state = gr.State([])
+    # 步驟3至步驟5之間的逐字稿與字幕內容保留在記憶體中，只有下載時才寫入檔案
+    # 步驟3 TTS 使用的逐字稿（供步驟3下載）與步驟4字幕校正使用的逐字稿分開保存
+    tts_transcript_state = gr.State("")
+    correction_transcript_state = gr.State("")
+    initial_srt_text_state = gr.State("")
+    corrected_srt_text_state = gr.State("")
     
     with gr.Tabs() as tabs:
         # 第一步：文本預處理部分
@@ -665,7 +1118,9 @@ with gr.Blocks(
                         type="password"
                     )
                     
-                    replace_btn = gr.Button("進行多音字替換")
+                    with gr.Row():
+                        replace_btn = gr.Button("進行多音字替換")
+                        reload_dictionary_btn = gr.Button("重新載入字典")
                     
                     step2_status_msg = gr.Textbox(label="狀態", interactive=False)
                 
@@ -703,13 +1158,13 @@ with gr.Blocks(
                     
                     with gr.Row():
                         voice_name = gr.Dropdown(
-                            choices=list(TTS_VOICES.keys()),
+                            choices=_VOICE_NAMES,
                             label="選擇語音",
                             value="訓練長"
                         )
                         
                         emotion = gr.Dropdown(
-                            choices=TTS_EMOTIONS,
+                            choices=_EMOTIONS,
                             label="選擇情緒",
                             value="neutral"
                         )
@@ -745,8 +1200,11 @@ with gr.Blocks(
                         interactive=False
                     )
                     
-                    # 隱藏的逐字稿文件路徑
-                    transcript_file_path = gr.Textbox(visible=False)
+                    download_transcript_btn = gr.Button("下載逐字稿")
+                    transcript_download_file = gr.File(
+                        label="逐字稿檔案",
+                        interactive=False
+                    )
                     
                     next_step_btn3 = gr.Button("進入字幕生成")
         
@@ -856,11 +1314,6 @@ with gr.Blocks(
                 interactive=False,
                 visible=False
             )
-            initial_srt_file = gr.File(
-                label="原始識別字幕 (SRT)",
-                interactive=False,
-                visible=False
-            )
         
         # 第五步：視頻預覽部分
         with gr.TabItem("步驟5: 視頻預覽") as tab5:
@@ -948,16 +1401,21 @@ with gr.Blocks(
                                 choices=[5, 10, 15, 20, 25, 30],
                                 value=20
                             )
+                            auto_file_concurrency = gr.Dropdown(
+                                label="同時處理檔案數",
+                                choices=[1, 2, 4],
+                                value=2
+                            )
                         
                         # 語音設定區塊
                         with gr.Row():
                             auto_voice_name = gr.Dropdown(
-                                choices=list(TTS_VOICES.keys()),
+                                choices=_VOICE_NAMES,
                                 label="選擇語音",
                                 value="訓練長"
                             )
                             auto_emotion = gr.Dropdown(
-                                choices=TTS_EMOTIONS,
+                                choices=_EMOTIONS,
                                 label="選擇情緒",
                                 value="neutral"
                             )
@@ -1022,13 +1480,9 @@ with gr.Blocks(
     
     # 從步驟1到步驟2的回調 - 傳遞數據並切換頁籤
     next_step_btn.click(
-        fn=lambda t, key: (t, key),
+        fn=lambda t, key: (t, key, gr.Tabs(selected=1)),  # 同時切換到步驟2頁籤
         inputs=[processed_text, google_api_key],
-        outputs=[step2_processed_text, step2_google_api_key]
-    ).then(
-        fn=lambda: gr.Tabs(selected=1),  # 切換到步驟2頁籤
-        inputs=None,
-        outputs=tabs
+        outputs=[step2_processed_text, step2_google_api_key, tabs]
     )
     
     # 步驟2的多音字替換回調
@@ -1039,21 +1493,24 @@ with gr.Blocks(
         api_name="replace_homophones"
     )
     
+    # 重新載入多音字字典
+    reload_dictionary_btn.click(
+        fn=invalidate_cached_services,
+        inputs=None,
+        outputs=[step2_status_msg]
+    )
+    
     # 從步驟2到步驟3的回調 - 傳遞數據並切換頁籤
     next_step_btn2.click(
-    fn=lambda t: t,
+    fn=lambda t: (t, gr.Tabs(selected=2)),  # 同時切換到步驟3頁籤
     inputs=[replaced_text],  # 使用 replaced_text (多音字替換後的文本)
-    outputs=[step3_replaced_text]
-    ).then(
-    fn=lambda: gr.Tabs(selected=2),  # 切換到步驟3頁籤
-    inputs=None,
-    outputs=tabs
+    outputs=[step3_replaced_text, tabs]
     )
     
     # 步驟3的TTS生成回調
     def generate_tts_and_save(text, api_key, voice_name, emotion, speed, custom_pronunciation):
-        status, file_list, zip_path, transcript_file, mp3_files = generate_tts(text, api_key, voice_name, emotion, speed, custom_pronunciation)
-        return status, file_list, zip_path, transcript_file, mp3_files
+        status, file_list, zip_path, transcript_text, mp3_files = generate_tts(text, api_key, voice_name, emotion, speed, custom_pronunciation)
+        return status, file_list, zip_path, transcript_text or "", mp3_files
 
     generate_btn.click(
         fn=generate_tts_and_save,
@@ -1069,42 +1526,49 @@ with gr.Blocks(
             step3_status_msg,
             generated_files,
             audio_zip,
-            transcript_file_path,
+            tts_transcript_state,
             mp3_files_state  # 儲存 mp3_files 到狀態變量
         ],
         api_name="generate_tts"
     )
     
+    # 下載逐字稿時才寫入檔案
+    download_transcript_btn.click(
+        fn=download_transcript,
+        inputs=[tts_transcript_state],
+        outputs=[transcript_download_file]
+    )
+    
     # 從步驟3到步驟4的回調 - 傳遞數據並切換頁籤
     def prepare_step4(audio_zip, preprocessed_text):
         """準備步驟4的數據，使用步驟1的預處理文本作為逐字稿"""
-        timestamp = int(time.time())
-        transcript_file = str(subtitle_dir / f"preprocessed_transcript_{timestamp}.txt")
-        
-        # 保存預處理文本作為逐字稿
-        with open(transcript_file, "w", encoding="utf-8") as f:
-            f.write(preprocessed_text)
-        
-        # 同時載入逐字稿內容以顯示在預覽區域
-        transcript_content = preprocessed_text
-        
-        return audio_zip, transcript_file, "zh", transcript_content
+        # 逐字稿以狀態傳遞，同時顯示在預覽區域，並切換到步驟4頁籤
+        return audio_zip, preprocessed_text, "zh", preprocessed_text, gr.Tabs(selected=3)
     
     next_step_btn3.click(
         fn=prepare_step4,
         inputs=[audio_zip, preprocessed_text_state],
-        outputs=[step4_audio_zip, step4_transcript_file, step4_language, transcript_preview]
-    ).then(
-        fn=lambda: gr.Tabs(selected=3),  # 切換到步驟4頁籤
-        inputs=None,
-        outputs=tabs
+        outputs=[step4_audio_zip, correction_transcript_state, step4_language, transcript_preview, tabs]
     )
     
-    # 當上傳逐字稿文件時更新預覽
+    # 當上傳逐字稿文件時更新預覽與逐字稿狀態
+    def load_transcript_to_state(transcript_file):
+        content = load_transcript(transcript_file)
+        if not transcript_file or not os.path.exists(transcript_file):
+            return content, ""
+        return content, content
+    
     step4_transcript_file.change(
-        fn=load_transcript,
+        fn=load_transcript_to_state,
         inputs=[step4_transcript_file],
-        outputs=[transcript_preview]
+        outputs=[transcript_preview, correction_transcript_state]
+    )
+    
+    # 使用者重新上傳檔案時清除讀取快取
+    step4_transcript_file.upload(
+        fn=lambda: _read_cached.cache_clear(),
+        inputs=None,
+        outputs=None
     )
     
     # 生成字幕按鈕回調 - 修改為只生成不校正
@@ -1118,56 +1582,52 @@ with gr.Blocks(
         outputs=[
             step4_status_msg,
             original_srt_preview,
-            initial_srt_file
+            initial_srt_text_state
         ]
     )
     
     # 校正字幕按鈕回調 - 使用生成的原始字幕進行校正
-    def correct_subtitle_and_save(transcript_file, initial_srt_file, gemini_api_key, batch_size):
-        status, corrected_srt_content, subtitle_file, correction_report = correct_subtitles_only(
-            transcript_file,
-            initial_srt_file,
+    def correct_subtitle_and_save(transcript_text, initial_srt_text, gemini_api_key, batch_size):
+        status, corrected_srt_content, correction_report = correct_subtitles_only(
+            transcript_text,
+            initial_srt_text,
             gemini_api_key,
             batch_size
         )
-        return status, corrected_srt_content, subtitle_file, correction_report
+        return status, corrected_srt_content, corrected_srt_content or "", correction_report
 
     correct_subtitle_btn.click(
         fn=correct_subtitle_and_save,
         inputs=[
-            step4_transcript_file,
-            initial_srt_file,
+            correction_transcript_state,
+            initial_srt_text_state,
             step4_gemini_api_key,
             batch_size
         ],
         outputs=[
             step4_status_msg,
             corrected_srt_preview,
-            subtitle_file,
+            corrected_srt_text_state,
             correction_report
         ]
     )
 
-    # 下載校正後字幕按鈕回調
+    # 下載校正後字幕按鈕回調 - 點擊時才寫入檔案
     download_srt_btn.click(
         fn=download_corrected_srt,
-        inputs=[subtitle_file],
+        inputs=[corrected_srt_text_state],
         outputs=[subtitle_file]
     )
 
     # 從步驟4到步驟5的回調 - 傳遞數據並切換頁籤
-    def prepare_step5(subtitle_file, corrected_srt_content):
-        """準備步驟5的數據"""
-        return corrected_srt_content, subtitle_file
+    def prepare_step5(corrected_srt_text, corrected_srt_content):
+        """準備步驟5的數據，視頻合成需要字幕檔案，此時才寫入，並切換到步驟5頁籤"""
+        return corrected_srt_content, download_corrected_srt(corrected_srt_text), gr.Tabs(selected=4)
 
     preview_effect_btn.click(
         fn=prepare_step5,
-        inputs=[subtitle_file, corrected_srt_preview],
-        outputs=[step5_subtitle_content, step5_subtitle_file]
-    ).then(
-        fn=lambda: gr.Tabs(selected=4),  # 切換到步驟5頁籤
-        inputs=None,
-        outputs=tabs
+        inputs=[corrected_srt_text_state, corrected_srt_preview],
+        outputs=[step5_subtitle_content, step5_subtitle_file, tabs]
     )
 
     # 步驟5的視頻預覽回調
@@ -1197,7 +1657,8 @@ with gr.Blocks(
             auto_emotion,
             auto_speed,
             auto_custom_pronunciation,
-            auto_batch_size
+            auto_batch_size,
+            auto_file_concurrency
         ],
         outputs=[
             auto_status_msg,
@@ -1207,5 +1668,8 @@ with gr.Blocks(
         api_name="batch_process_all"
     )
 
+# 啟用佇列，讓多個請求可由 Gradio 的工作執行緒同時處理
+app.queue(max_size=32, default_concurrency_limit=4)
+
 if __name__ == "__main__":
     app.launch()
\ No newline at end of file
@@ -3,25 +3,132 @@
 import os
 import subprocess
 import tempfile
-import shutil
+from functools import lru_cache
 from pathlib import Path
 
+from utils.ffmpeg_tools import ffmpeg_path
 
-def _check_ffmpeg(self):
-    """檢查系統是否安裝了ffmpeg"""
+try:
+    import chardet  # 可選：用於偵測非 UTF-8 字幕的編碼
+except ImportError:
+    chardet = None
+
+
+def _decode_subtitle(raw):
+    """解碼字幕檔內容，只讀取一次並只解碼一次
+
+    依序判斷 UTF-8 BOM、UTF-8，再以 chardet 偵測（未安裝時依序嘗試 BIG5、GBK）。
+
+    Args:
+        raw (bytes): 字幕檔原始內容
+
+    Returns:
+        tuple: (字幕文字, 原始內容是否已是無 BOM 的 UTF-8)
+    """
+    if raw.startswith(b'\xef\xbb\xbf'):
+        return raw.decode('utf-8-sig', errors='replace'), False
+
+    try:
+        return raw.decode('utf-8'), True
+    except UnicodeDecodeError:
+        pass
+
+    if chardet is not None:
+        encoding = chardet.detect(raw)['encoding'] or 'big5'
+        return raw.decode(encoding, errors='replace'), False
+
+    # 未安裝 chardet：BIG5 (繁體中文常用編碼)，最後 GBK (簡體中文常用編碼)
+    try:
+        return raw.decode('big5'), False
+    except UnicodeDecodeError:
+        return raw.decode('gbk', errors='replace'), False
+
+
+@lru_cache(maxsize=1024)
+def _norm(path):
+    """標準化路徑（絕對路徑、正斜線），結果依路徑快取"""
+    return os.path.normpath(os.path.abspath(path)).replace('\\', '/')
+
+
+@lru_cache(maxsize=1)
+def _has_nvenc():
+    """檢查 ffmpeg 是否編譯了 h264_nvenc 編碼器，每個行程只檢查一次"""
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        return False
     try:
-        # 在 Hugging Face 環境中，優先檢查 /usr/bin/ffmpeg
-        if os.path.exists("/usr/bin/ffmpeg"):
-            subprocess.run(["/usr/bin/ffmpeg", "-version"], check=True,
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            return True
-
-        # 然後嘗試系統 PATH 中的 ffmpeg
-        subprocess.run(["ffmpeg", "-version"], check=True,
-                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return True
-    except (subprocess.SubprocessError, FileNotFoundError):
+        process = subprocess.run([ffmpeg, "-hide_banner", "-encoders"], check=True,
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except (subprocess.SubprocessError, OSError):
         return False
+    return b"h264_nvenc" in process.stdout
+
+
+# 編譯了 NVENC 但實際無法使用（例如沒有 GPU）時設為 True，之後直接使用 libx264
+_nvenc_failed = False
+
+# ffmpeg 錯誤訊息中代表 NVENC 編碼器無法初始化的片段（比對時不分大小寫）
+_NVENC_ERROR_MARKERS = (b"nvenc", b"no capable devices found", b"libcuda", b"cuda")
+
+
+def _is_nvenc_error(stderr):
+    """判斷 ffmpeg 的錯誤輸出是否來自 NVENC 編碼器初始化失敗"""
+    stderr = (stderr or b"").lower()
+    return any(marker in stderr for marker in _NVENC_ERROR_MARKERS)
+
+
+def _run_video_cmd(build_cmd):
+    """執行視頻編碼命令，NVENC 可用時優先使用，失敗則改用 libx264 重試
+
+    只有錯誤來自 NVENC 本身時才在之後停用 NVENC；其他錯誤（例如字幕或輸入檔有問題）
+    只以 libx264 重試這一次。
+
+    Args:
+        build_cmd (callable): 傳入編碼器參數、返回完整 ffmpeg 命令的函數
+    """
+    global _nvenc_failed
+    if _has_nvenc() and not _nvenc_failed:
+        try:
+            subprocess.run(build_cmd(NVENC_ARGS), check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            return
+        except subprocess.CalledProcessError as e:
+            if _is_nvenc_error(e.stderr):
+                _nvenc_failed = True
+                print("警告: NVENC 無法使用，之後改用 libx264")
+            else:
+                print("警告: NVENC 編碼失敗，改用 libx264 重試")
+
+    subprocess.run(build_cmd(X264_STILL_ARGS), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+# 每次合成使用的小型臨時檔（字幕、concat 列表）放在記憶體檔案系統，避免寫入實體磁碟
+_TMP_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else tempfile.gettempdir()
+
+# 黑色背景畫面完全靜止，關閉動態搜尋並拉長關鍵幀間隔即可大幅加快編碼
+X264_STILL_ARGS = [
+    "-c:v", "libx264",
+    "-preset", "ultrafast",
+    "-tune", "stillimage",
+    "-crf", "30",
+    "-g", "240",
+    "-x264-params", "no-scenecut=1:keyint=240",
+]
+
+# 有 NVIDIA GPU 時改用 NVENC 硬體編碼，釋出 CPU 給其他請求
+NVENC_ARGS = [
+    "-c:v", "h264_nvenc",
+    "-preset", "p1",
+    "-rc", "vbr",
+    "-cq", "28",
+]
+
+# ffmpeg 成功時不輸出進度與橫幅，stderr 只保留錯誤訊息
+FFMPEG_QUIET_ARGS = ["-hide_banner", "-loglevel", "error", "-nostats"]
+
+# 燒入字幕時使用的字幕樣式
+SUBTITLE_FORCE_STYLE = "Fontname=Arial,FontSize=18,PrimaryColour=&Hffffff&,Alignment=2,MarginL=180,MarginR=180"
 
 
 class AudioMergeError(Exception):
@@ -42,17 +149,7 @@ class AudioMerger:
         self.output_dir = output_dir if output_dir else tempfile.mkdtemp()
 
         # 確保輸出目錄存在
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
-
-    def _check_ffmpeg(self):
-        """檢查系統是否安裝了ffmpeg"""
-        try:
-            subprocess.run(["ffmpeg", "-version"], check=True,
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            return True
-        except (subprocess.SubprocessError, FileNotFoundError):
-            return False
+        Path(self.output_dir).mkdir(parents=True, exist_ok=True)
 
     def _normalize_path(self, path):
         """標準化路徑格式，處理特殊字符
@@ -63,11 +160,8 @@ class AudioMerger:
         Returns:
             str: 標準化後的路徑
         """
-        # 轉換為絕對路徑
-        abs_path = os.path.abspath(path)
-        # 標準化路徑分隔符
-        norm_path = os.path.normpath(abs_path).replace('\\', '/')
-        return norm_path
+        # 轉換為絕對路徑並標準化路徑分隔符（結果已快取）
+        return _norm(os.fspath(path))
 
     def _escape_path_for_ffmpeg(self, path):
         """為 FFmpeg 命令轉義路徑
@@ -84,10 +178,45 @@ class AudioMerger:
             path = 'file:' + path.replace(':', '\\:').replace('\\', '//')
         return path
 
+    def _escape_filter_path(self, path):
+        """為 ffmpeg 濾鏡參數轉義路徑
+
+        依 libavfilter 的兩層轉義規則：路徑以單引號包住，避開濾鏡圖層級的
+        ',' ';' '[' ']'；引號內的 '\\' 與 ':' 仍需轉義一次給濾鏡選項解析器，
+        單引號則需先結束引號再轉義。
+
+        Args:
+            path (str): 已標準化（使用正斜線）的路徑
+
+        Returns:
+            str: 可直接放入濾鏡圖的路徑字串
+        """
+        escaped = (path.replace('\\', '\\\\')
+                   .replace(':', '\\:')
+                   .replace("'", "'\\\\\\''"))
+        return f"'{escaped}'"
+
+    def _write_concat_list(self, audio_files, list_path):
+        """寫入 ffmpeg concat 分離器使用的文件列表
+
+        Args:
+            audio_files (list): 音頻文件路徑列表
+            list_path (str): 文件列表輸出路徑
+        """
+        # 標準化路徑，單引號需以 '\'' 轉義，組成完整內容後一次寫入
+        lines = (
+            "file '" + self._normalize_path(audio_file).replace("'", "'\\''") + "'\n"
+            for audio_file in audio_files
+        )
+        Path(list_path).write_text("".join(lines), encoding='utf-8')
+
     def merge_audio_files(self, audio_files, output_path):
         """
         合併多個音頻文件
 
+        以 ffmpeg concat 分離器直接複製音訊串流，不重新編碼；
+        各段 MP3 的 ID3 標籤與 Xing/Info 資訊音框由分離器處理，輸出時重新寫入整體的資訊音框。
+
         Args:
             audio_files (list): 音頻文件路徑列表
             output_path (str): 輸出文件路徑
@@ -104,44 +233,37 @@ class AudioMerger:
                 return False, f"找不到音頻文件: {file_path}"
 
         # 檢查ffmpeg是否可用
-        if not self._check_ffmpeg():
+        if ffmpeg_path() is None:
             return False, "系統未安裝 ffmpeg，無法處理音頻"
 
         try:
-            # 創建臨時目錄管理所有文件
-            temp_dir = tempfile.mkdtemp()
-
-            # 創建一個臨時文件列表
-            file_list_path = os.path.join(temp_dir, "file_list.txt")
-            with open(file_list_path, 'w', encoding='utf-8') as f:
-                for audio_file in audio_files:
-                    # 標準化路徑
-                    norm_path = self._normalize_path(audio_file)
-                    f.write(f"file '{norm_path}'\n")
-
-            # 標準化輸出路徑
-            norm_output = self._normalize_path(output_path)
-
-            # 使用ffmpeg合併音頻
-            cmd = [
-                "ffmpeg",
-                "-y",  # 覆寫現有文件
-                "-f", "concat",
-                "-safe", "0",
-                "-i", file_list_path,
-                "-c", "copy",
-                norm_output
-            ]
-
-            process = subprocess.run(
-                cmd,
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
+            # 創建臨時目錄管理所有文件，離開時自動清理
+            with tempfile.TemporaryDirectory(dir=_TMP_ROOT) as temp_dir:
+                # 創建一個臨時文件列表
+                file_list_path = os.path.join(temp_dir, "file_list.txt")
+                self._write_concat_list(audio_files, file_list_path)
+
+                # 標準化輸出路徑
+                norm_output = self._normalize_path(output_path)
+
+                # 使用ffmpeg合併音頻
+                cmd = [
+                    ffmpeg_path(),
+                    *FFMPEG_QUIET_ARGS,
+                    "-y",  # 覆寫現有文件
+                    "-f", "concat",
+                    "-safe", "0",
+                    "-i", file_list_path,
+                    "-c", "copy",
+                    norm_output
+                ]
 
-            # 清理臨時目錄
-            shutil.rmtree(temp_dir, ignore_errors=True)
+                subprocess.run(
+                    cmd,
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE
+                )
 
             # 檢查輸出文件是否存在
             if not os.path.exists(output_path):
@@ -163,28 +285,26 @@ class AudioMerger:
                 return False, f"找不到音頻文件: {audio_path}"
 
             # 檢查ffmpeg是否可用
-            if not self._check_ffmpeg():
+            if ffmpeg_path() is None:
                 return False, "系統未安裝 ffmpeg，無法處理視頻"
 
             # 標準化路徑
             norm_audio = self._normalize_path(audio_path)
             norm_output = self._normalize_path(output_path)
 
-            cmd = [
-                "ffmpeg",
+            _run_video_cmd(lambda encoder_args: [
+                ffmpeg_path(),
+                *FFMPEG_QUIET_ARGS,
                 "-y",  # 覆寫現有文件
                 "-f", "lavfi",
                 "-i", f"color=c=black:s={width}x{height}:r=24",
                 "-i", norm_audio,
-                "-c:v", "libx264",
-                "-c:a", "aac",
+                *encoder_args,
+                "-c:a", "copy",  # 合併後的 MP3 直接封裝，不重新編碼
                 "-shortest",
                 "-pix_fmt", "yuv420p",
                 norm_output
-            ]
-
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE,
-                           stderr=subprocess.PIPE)
+            ])
 
             return True, output_path
         except Exception as e:
@@ -192,10 +312,14 @@ class AudioMerger:
 
     def create_video_with_subtitles(self, audio_path, subtitle_path, output_path, width=1280, height=720):
         """
-        創建帶字幕的視頻，採用多種備選方案確保成功率
+        創建帶字幕的視頻
+
+        黑色背景、音頻與字幕在同一個 ffmpeg 濾鏡圖中完成，不產生中間視頻檔。
+        audio_path 為音頻文件列表時，以 concat 分離器直接讀取各段音頻，
+        不需要先合併成單一音頻檔。
 
         Args:
-            audio_path (str): 音頻文件路徑
+            audio_path (str | list): 音頻文件路徑，或依序播放的音頻文件路徑列表
             subtitle_path (str): 字幕文件路徑
             output_path (str): 輸出視頻路徑
             width (int, optional): 視頻寬度. 默認為1280.
@@ -204,149 +328,97 @@ class AudioMerger:
         Returns:
             tuple: (成功標誌, 輸出路徑或錯誤消息)
         """
-        if not os.path.exists(audio_path):
-            return False, f"找不到音頻文件: {audio_path}"
+        audio_files = audio_path if isinstance(audio_path, (list, tuple)) else [audio_path]
+        if not audio_files:
+            return False, "沒有提供音頻文件"
+
+        for file_path in audio_files:
+            if not os.path.exists(file_path):
+                return False, f"找不到音頻文件: {file_path}"
 
         if not os.path.exists(subtitle_path):
             return False, f"找不到字幕文件: {subtitle_path}"
 
         # 檢查ffmpeg是否可用
-        if not self._check_ffmpeg():
+        if ffmpeg_path() is None:
             return False, "系統未安裝 ffmpeg，無法處理視頻"
 
         try:
-            # 創建臨時工作目錄
-            temp_dir = tempfile.mkdtemp()
-
-            # 複製字幕文件到臨時位置，使用簡單文件名並處理編碼
-            temp_subtitle = os.path.join(temp_dir, "simple.srt")
-
-            # 嘗試使用不同編碼讀取字幕文件
-            try:
-                # 嘗試使用 UTF-8 讀取
-                with open(subtitle_path, 'r', encoding='utf-8') as src:
-                    content = src.read()
-            except UnicodeDecodeError:
-                # 如果 UTF-8 失敗，嘗試使用 BIG5 (繁體中文常用編碼)
-                try:
-                    with open(subtitle_path, 'r', encoding='big5') as src:
-                        content = src.read()
-                except UnicodeDecodeError:
-                    # 最後嘗試 GBK (簡體中文常用編碼)
-                    with open(subtitle_path, 'r', encoding='gbk') as src:
-                        content = src.read()
-
-            # 確保字幕內容格式正確
-            if not content.strip():
-                return False, "字幕文件為空"
-
-            # 始終以 UTF-8 寫入臨時文件
-            with open(temp_subtitle, 'w', encoding='utf-8') as dst:
-                dst.write(content)
-
-            # 標準化路徑
-            norm_audio = self._normalize_path(audio_path)
-            norm_subtitle = self._normalize_path(temp_subtitle)
-            norm_output = self._normalize_path(output_path)
-
-            # 打印調試信息
-            print(f"音頻路徑: {norm_audio}")
-            print(f"字幕路徑: {norm_subtitle}")
-            print(f"輸出路徑: {norm_output}")
-
-            # 方法1: 使用兩步驟方法
-            # 步驟1: 創建不含字幕的黑色背景視頻
-            temp_video = os.path.join(temp_dir, "temp_video.mp4")
-
-            cmd1 = [
-                "ffmpeg",
-                "-y",
-                "-f", "lavfi",
-                "-i", f"color=c=black:s={width}x{height}:r=24",
-                "-i", norm_audio,
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-shortest",
-                "-pix_fmt", "yuv420p",
-                temp_video
-            ]
-
-            subprocess.run(cmd1, check=True,
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-            # 標準化臨時視頻路徑
-            norm_temp_video = self._normalize_path(temp_video)
-
-            # 為 FFmpeg 特別處理字幕路徑
-            ffmpeg_subtitle_path = f"'{norm_subtitle}'"
-
-            try:
-                # 方法2: 嘗試使用內置字幕渲染，但使用更安全的路徑格式和調整字體大小
-                cmd2 = [
-                    "ffmpeg",
+            # 創建臨時工作目錄，離開時自動清理
+            with tempfile.TemporaryDirectory(dir=_TMP_ROOT) as temp_dir:
+                # 字幕放到臨時位置，使用簡單文件名並處理編碼
+                temp_subtitle = os.path.join(temp_dir, "simple.srt")
+
+                # 讀取一次並偵測編碼
+                raw = Path(subtitle_path).read_bytes()
+                content, is_utf8 = _decode_subtitle(raw)
+
+                # 確保字幕內容格式正確
+                if not content.strip():
+                    return False, "字幕文件為空"
+
+                # 已是 UTF-8 時直接建立硬連結（跨檔案系統時改為寫入），否則以 UTF-8 寫入臨時文件
+                linked = False
+                if is_utf8:
+                    try:
+                        os.link(subtitle_path, temp_subtitle)
+                        linked = True
+                    except OSError:
+                        pass
+                if not linked:
+                    Path(temp_subtitle).write_bytes(content.encode('utf-8'))
+
+                # 音頻輸入：單一檔案直接讀取，多個檔案使用 concat 分離器
+                if len(audio_files) == 1:
+                    audio_input = ["-i", self._normalize_path(audio_files[0])]
+                else:
+                    file_list_path = os.path.join(temp_dir, "file_list.txt")
+                    self._write_concat_list(audio_files, file_list_path)
+                    audio_input = ["-f", "concat", "-safe", "0", "-i", file_list_path]
+
+                # 標準化路徑
+                norm_subtitle = self._normalize_path(temp_subtitle)
+                norm_output = self._normalize_path(output_path)
+
+                # 打印調試信息
+                print(f"音頻文件數: {len(audio_files)}")
+                print(f"字幕路徑: {norm_subtitle}")
+                print(f"輸出路徑: {norm_output}")
+
+                subtitle_filter = (
+                    f"subtitles={self._escape_filter_path(norm_subtitle)}"
+                    f":force_style='{SUBTITLE_FORCE_STYLE}'"
+                )
+
+                # 單一濾鏡圖：黑色背景燒入字幕，音頻重新取樣以對齊多段音頻的時間戳
+                # 字幕濾鏡在 CPU 上執行，編碼器視硬體選擇
+                _run_video_cmd(lambda encoder_args: [
+                    ffmpeg_path(),
+                    *FFMPEG_QUIET_ARGS,
                     "-y",
-                    "-i", norm_temp_video,
-                    "-vf", f"subtitles={ffmpeg_subtitle_path}:force_style='Fontname=Arial,FontSize=18,PrimaryColour=&Hffffff&,Alignment=2,MarginL=180,MarginR=180'",
-                    "-c:a", "copy",
+                    "-f", "lavfi",
+                    "-i", f"color=c=black:s={width}x{height}:r=24",
+                    *audio_input,
+                    "-filter_complex", f"[1:a]aresample=async=1[a];[0:v]{subtitle_filter}[v]",
+                    "-map", "[v]",
+                    "-map", "[a]",
+                    *encoder_args,
+                    "-c:a", "aac",
+                    "-shortest",
+                    "-pix_fmt", "yuv420p",
                     norm_output
-                ]
+                ])
 
-                subprocess.run(cmd2, check=True,
-                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            except subprocess.CalledProcessError:
-                try:
-                    # 方法3: 嘗試使用絕對路徑方式
-                    subtitle_filename = os.path.basename(temp_subtitle)
-                    # 複製字幕到當前工作目錄
-                    current_dir_subtitle = os.path.join(
-                        os.getcwd(), subtitle_filename)
-                    shutil.copy2(temp_subtitle, current_dir_subtitle)
-
-                    cmd3 = [
-                        "ffmpeg",
-                        "-y",
-                        "-i", norm_temp_video,
-                        "-vf", f"subtitles={subtitle_filename}:force_style='Fontname=Arial,FontSize=18,PrimaryColour=&Hffffff&,Alignment=2,MarginL=180,MarginR=180'",
-                        "-c:a", "copy",
-                        norm_output
-                    ]
-
-                    subprocess.run(
-                        cmd3, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-                    # 清理臨時文件
-                    if os.path.exists(current_dir_subtitle):
-                        os.remove(current_dir_subtitle)
-
-                except subprocess.CalledProcessError:
-                    try:
-                        # 方法4: 使用 MOV 字幕容器
-                        cmd4 = [
-                            "ffmpeg",
-                            "-y",
-                            "-i", norm_temp_video,
-                            "-f", "srt",
-                            "-i", norm_subtitle,
-                            "-c:v", "copy",
-                            "-c:a", "copy",
-                            "-c:s", "mov_text",
-                            norm_output
-                        ]
-                        subprocess.run(
-                            cmd4, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    except subprocess.CalledProcessError:
-                        # 方法5: 如果都失敗，只使用沒有字幕的視頻
-                        shutil.copy2(temp_video, output_path)
-                        print("警告: 無法添加字幕，使用無字幕視頻作為替代")
-
-            # 清理臨時文件
-            shutil.rmtree(temp_dir, ignore_errors=True)
+                if not os.path.exists(output_path):
+                    return False, "視頻創建失敗，未生成輸出文件"
 
-            if not os.path.exists(output_path):
-                return False, "視頻創建失敗，未生成輸出文件"
-
-            return True, output_path
+                return True, output_path
 
+        except subprocess.CalledProcessError as e:
+            error_message = e.stderr.decode(
+                'utf-8', errors='replace') if e.stderr else str(e)
+            print(f"視頻創建錯誤: {error_message}")
+            return False, f"視頻創建過程出錯: {error_message}"
         except Exception as e:
             print(f"視頻創建錯誤: {str(e)}")
             return False, f"視頻創建過程中發生未知錯誤: {str(e)}"
@@ -4,8 +4,21 @@ import json
 import re
 import os
 from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Tuple
-import google.generativeai as genai
+from utils.api_handler import generate_text
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick 為選用套件
+    ahocorasick = None
+
+# 斷詞使用的 Google AI 模型
+SEGMENTATION_MODEL = "gemini-1.5-flash"
+
+# 段落分隔（兩個換行之間只有空白）
+_PARA_RE = re.compile(r'\n\s*\n')
 
 class HomophoneReplacer:
     """
@@ -21,6 +34,9 @@ class HomophoneReplacer:
         """
         # 預設字典
         self.dictionary = []
+        self._usecase_map = {}
+        self._usecase_re = None
+        self._automaton = None
         
         # 如果提供了字典檔案，則載入
         if dictionary_file and os.path.exists(dictionary_file):
@@ -39,6 +55,7 @@ class HomophoneReplacer:
         try:
             with open(dictionary_file, 'r', encoding='utf-8') as f:
                 self.dictionary = json.load(f)
+            self._build_index()
             print(f"Successfully loaded dictionary from {dictionary_file}")
         except FileNotFoundError:
             print(f"Dictionary file not found at {dictionary_file}")
@@ -72,7 +89,65 @@ class HomophoneReplacer:
             }
             # 在實際代碼中應包含完整的字典
         ]
+        self._build_index()
         print("Loaded built-in dictionary")
+    
+    def _build_index(self) -> None:
+        """
+        依字典建立替換詞索引，供 replace_homophones 單次掃描使用
+        
+        同一個替換詞只保留字典中第一次出現的設定，報告順序也依字典順序
+        """
+        self._usecase_map = {}
+        for item in self.dictionary:
+            if not ('usecase' in item and 'original' in item and 'modified' in item):
+                print(f"Skipping malformed dictionary entry: {item.get('no', item)}")
+                continue
+            original = item['original']
+            modified = item['modified']
+            for usecase_word in item['usecase']:
+                if usecase_word and usecase_word not in self._usecase_map:
+                    self._usecase_map[usecase_word] = (
+                        original, modified, usecase_word.replace(original, modified)
+                    )
+        
+        # 依長度由長到短排列，同一位置優先匹配最長的詞
+        self._usecase_re = None
+        if self._usecase_map:
+            self._usecase_re = re.compile("|".join(
+                re.escape(w) for w in sorted(self._usecase_map, key=len, reverse=True)
+            ))
+        
+        self._automaton = None
+        if ahocorasick is not None and self._usecase_map:
+            automaton = ahocorasick.Automaton()
+            for usecase_word in self._usecase_map:
+                automaton.add_word(usecase_word, usecase_word)
+            automaton.make_automaton()
+            self._automaton = automaton
+    
+    def _find_matches(self, text: str) -> List[Tuple[int, str]]:
+        """
+        以 pyahocorasick 找出文本中所有不重疊的替換詞（最左優先，同位置取最長）
+        
+        Args:
+            text (str): 輸入文本
+            
+        Returns:
+            List[Tuple[int, str]]: (起始位置, 替換詞) 列表，依位置排序
+        """
+        candidates = sorted(
+            (end - len(word) + 1, -len(word), word)
+            for end, word in self._automaton.iter(text)
+        )
+        
+        matches = []
+        last_end = 0
+        for start, _, usecase_word in candidates:
+            if start >= last_end:
+                matches.append((start, usecase_word))
+                last_end = start + len(usecase_word)
+        return matches
         
     def segment_text(self, text: str, batch_size: int = 10) -> List[str]:
         """
@@ -86,47 +161,53 @@ class HomophoneReplacer:
             List[str]: 分段後的批次列表
         """
         # 分割文本段落（以兩個換行符為分隔）
-        paragraphs = re.split(r'\n\s*\n', text)
+        paragraphs = _PARA_RE.split(text)
         
         # 過濾空段落
-        paragraphs = [p.strip() for p in paragraphs if p.strip()]
+        paragraphs = list(filter(None, map(str.strip, paragraphs)))
         
         # 分批
-        batches = []
-        for i in range(0, len(paragraphs), batch_size):
-            batch = paragraphs[i:i+batch_size]
-            batches.append("\n\n".join(batch))
-            
-        return batches
+        return ["\n\n".join(paragraphs[i:i+batch_size]) for i in range(0, len(paragraphs), batch_size)]
     
-    def process_with_google_ai(self, text_batches: List[str], api_key: str) -> str:
+    def process_batch_with_google_ai(self, batch: str, api_key: str, model: str = SEGMENTATION_MODEL) -> str:
         """
-        使用Google AI處理文本批次，進行斷詞
+        使用Google AI處理單一文本批次，進行斷詞
         
         Args:
-            text_batches (List[str]): 文本批次列表
+            batch (str): 文本批次
             api_key (str): Google AI API金鑰
+            model (str): 模型名稱
             
         Returns:
-            str: 合併後的處理結果
+            str: 處理結果
         """
         from prompts.zh_prompt import TEXT_SEGMENTATION_PROMPT
         
-        # 配置Google AI
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
+        # 準備提示詞
+        prompt = TEXT_SEGMENTATION_PROMPT.format(article=batch)
         
-        all_results = []
+        # 呼叫API（金鑰隨請求傳送，不修改全域設定）
+        return generate_text(prompt, api_key, model=model)
+    
+    def process_with_google_ai(self, text_batches: List[str], api_key: str, max_workers: int = 1) -> str:
+        """
+        使用Google AI處理文本批次，進行斷詞
         
-        for batch in text_batches:
-            # 準備提示詞
-            prompt = TEXT_SEGMENTATION_PROMPT.format(article=batch)
-            
-            # 呼叫API
-            response = model.generate_content(prompt)
+        Args:
+            text_batches (List[str]): 文本批次列表
+            api_key (str): Google AI API金鑰
+            max_workers (int): 同時處理的批次數量
             
-            # 添加結果
-            all_results.append(response.text)
+        Returns:
+            str: 合併後的處理結果
+        """
+        # 同時送出多個批次，結果依原順序合併
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [
+                executor.submit(self.process_batch_with_google_ai, batch, api_key)
+                for batch in text_batches
+            ]
+            all_results = [future.result() for future in futures]
         
         # 合併所有結果
         return "\n\n".join(all_results)
@@ -144,30 +225,40 @@ class HomophoneReplacer:
         if not text or not self.dictionary:
             return text, []
         
-        modified_text = text
-        report = []
+        counts = {}
         
-        for item in self.dictionary:
-            if 'usecase' in item and 'original' in item and 'modified' in item:
-                original = item['original']
-                modified = item['modified']
-                for usecase_word in item['usecase']:
-                    # 計算替換前出現次數
-                    count_before = modified_text.count(usecase_word)
-                    if count_before > 0:
-                        # 進行替換
-                        modified_text = modified_text.replace(
-                            usecase_word, 
-                            usecase_word.replace(original, modified)
-                        )
-                        
-                        # 將替換資訊添加到報告中
-                        report.append({
-                            "original": original,
-                            "modified": modified,
-                            "word": usecase_word,
-                            "instances": count_before
-                        })
+        def _replace(match):
+            usecase_word = match.group(0)
+            counts[usecase_word] = counts.get(usecase_word, 0) + 1
+            return self._usecase_map[usecase_word][2]
+        
+        if self._automaton is not None:
+            # 單次掃描文本，替換結果先放入列表最後再合併
+            parts = []
+            last = 0
+            for start, usecase_word in self._find_matches(text):
+                parts.append(text[last:start])
+                parts.append(self._usecase_map[usecase_word][2])
+                counts[usecase_word] = counts.get(usecase_word, 0) + 1
+                last = start + len(usecase_word)
+            parts.append(text[last:])
+            modified_text = "".join(parts)
+        elif self._usecase_re is not None:
+            # 未安裝 pyahocorasick 時，以單一交替正則表達式替換
+            modified_text = self._usecase_re.sub(_replace, text)
+        else:
+            modified_text = text
+        
+        # 將替換資訊依字典順序添加到報告中
+        report = []
+        for usecase_word, (original, modified, _) in self._usecase_map.items():
+            if usecase_word in counts:
+                report.append({
+                    "original": original,
+                    "modified": modified,
+                    "word": usecase_word,
+                    "instances": counts[usecase_word]
+                })
         
         # 移除斷詞符號
         final_text = modified_text.replace('^', '')
@@ -187,23 +278,23 @@ class HomophoneReplacer:
         if not report:
             return "未進行任何多音字替換"
         
-        # 按原字分組
-        grouped_by_original = {}
-        total_replacements = 0
+        # 按原字分組，同時累計各組與全部的替換次數
+        grouped_by_original = defaultdict(list)
+        group_totals = defaultdict(int)
         
         for item in report:
             original = item['original']
-            if original not in grouped_by_original:
-                grouped_by_original[original] = []
             grouped_by_original[original].append(item)
-            total_replacements += item['instances']
+            group_totals[original] += item['instances']
+        
+        total_replacements = sum(group_totals.values())
         
         # 格式化報告
         report_lines = [f"## 多音字替換報告（共替換 {total_replacements} 處）", ""]
         
         for original, items in grouped_by_original.items():
             modified = items[0]['modified']  # 替換成的字應該是一致的
-            group_total = sum(item['instances'] for item in items)
+            group_total = group_totals[original]
             words = [f"{item['word']} ({item['instances']}次)" for item in items]
             
             report_lines.append(f"### 將「{original}」替換為「{modified}」（共 {group_total} 處）")
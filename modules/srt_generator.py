@@ -1,10 +1,92 @@
 # modules/srt_generator.py
 import os
 import re
-import tempfile
-from typing import List, Tuple, Optional, Dict
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, List, Tuple, Optional, Dict, Union
 from pydub import AudioSegment
-from modules.openai_utils import get_openai_client  # 使用統一的客戶端獲取函數
+from utils.ffmpeg_tools import ffprobe_path
+
+try:
+    import mutagen  # 可選：只讀取檔頭即可取得音頻時長
+except ImportError:
+    mutagen = None
+
+# 音頻來源：檔案路徑，或 (檔名, 已開啟的二進位檔案物件)
+AudioSource = Union[str, Tuple[str, BinaryIO]]
+
+# SRT 時間行：開始與結束時間的時、分、秒、毫秒
+_TIMING_RE = re.compile(r'(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})\s*$')
+# 檔名開頭的數字
+_LEADING_NUM_RE = re.compile(r'^\d+')
+
+# 中文字幕的半形→全形標點轉換表
+_ZH_PUNCT_TABLE = str.maketrans({
+    ',': '，',  # 逗號
+    '.': '。',  # 句號
+    ':': '：',  # 冒號
+    '?': '？',  # 問號
+    '!': '！',  # 感嘆號
+})
+
+def _source_name(source: AudioSource) -> str:
+    """取得音頻來源的檔名"""
+    if isinstance(source, tuple):
+        return os.path.basename(source[0])
+    return os.path.basename(source)
+
+def _leading_number(source: AudioSource) -> float:
+    """取得檔名開頭的數字作為排序鍵，沒有數字時排在最後"""
+    match = _LEADING_NUM_RE.match(_source_name(source))
+    return int(match.group()) if match else float('inf')
+
+def _hms_to_ms(hours: str, minutes: str, seconds: str, ms: str) -> int:
+    """將時、分、秒、毫秒字串轉換為整數毫秒"""
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(ms)
+
+def _fmt_ts(ms: int) -> str:
+    """將整數毫秒轉換為SRT時間格式"""
+    seconds, ms = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+class SrtEntry:
+    """單一SRT條目，時間以整數毫秒保存"""
+    __slots__ = ('index', 'start_ms', 'end_ms', 'text')
+    
+    def __init__(self, index: int, start_ms: int, end_ms: int, text: str):
+        self.index = index
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+
+def _iter_srt_entries(srt_content: str) -> Iterator[SrtEntry]:
+    """逐一產生SRT條目，以空行分割，每個條目為「序號、時間行、文本（一行以上）」"""
+    for block in srt_content.replace('\r\n', '\n').split('\n\n'):
+        lines = block.strip('\n').split('\n', 2)
+        if len(lines) < 3 or not lines[0].strip().isdigit():
+            continue
+        timing = _TIMING_RE.match(lines[1])
+        if not timing:
+            continue
+        text = lines[2].strip()
+        if not text:
+            continue
+        
+        yield SrtEntry(
+            int(lines[0]),
+            _hms_to_ms(*timing.group(1, 2, 3, 4)),
+            _hms_to_ms(*timing.group(5, 6, 7, 8)),
+            text
+        )
+
+def _format_srt(entries: Iterable[SrtEntry]) -> str:
+    """將解析後的條目轉換回SRT格式，時間戳只在此處由毫秒轉為字串"""
+    parts = []
+    for entry in entries:
+        parts.append(f"{entry.index}\n{_fmt_ts(entry.start_ms)} --> {_fmt_ts(entry.end_ms)}\n{entry.text}\n\n")
+    return "".join(parts)
 
 class SRTGenerator:
     """
@@ -20,28 +102,77 @@ class SRTGenerator:
         self.temp_dir = temp_dir
         os.makedirs(temp_dir, exist_ok=True)
     
-    def get_audio_duration(self, file_path: str) -> float:
-        """使用pydub獲取音頻文件的長度（秒）
+    def get_audio_duration(self, file_path: AudioSource) -> float:
+        """獲取音頻文件的長度（秒）
+        
+        只讀取檔頭資訊：優先使用 mutagen，其次 ffprobe（檔案物件需有磁碟上的路徑），
+        兩者都無法取得時才以 pydub 完整解碼。
         
         Args:
-            file_path: 音頻檔案路徑
+            file_path: 音頻檔案路徑，或 (檔名, 檔案物件)
             
         Returns:
             音頻時長（秒）
         """
+        duration = self._probe_duration(file_path)
+        if duration:
+            return duration
+        
         try:
-            audio = AudioSegment.from_file(file_path)
+            if isinstance(file_path, tuple):
+                audio_file = file_path[1]
+                audio_file.seek(0)
+                audio = AudioSegment.from_file(audio_file, format="mp3")
+            else:
+                audio = AudioSegment.from_file(file_path)
             return audio.duration_seconds
         except Exception as e:
             print(f"獲取音頻長度失敗: {str(e)}")
             return 0.0
     
-    def transcribe(self, file_path: str, api_key: str, language: str = "zh", **kwargs) -> str:
+    @staticmethod
+    def _probe_duration(file_path: AudioSource) -> Optional[float]:
+        """不解碼音頻，從檔頭讀取時長（秒），無法讀取時返回 None"""
+        if mutagen is not None:
+            try:
+                if isinstance(file_path, tuple):
+                    audio_file = file_path[1]
+                    audio_file.seek(0)
+                    info = mutagen.File(audio_file)
+                    audio_file.seek(0)
+                else:
+                    info = mutagen.File(file_path)
+                if info is not None and info.info.length:
+                    return float(info.info.length)
+            except Exception:
+                pass
+        
+        ffprobe = ffprobe_path()
+        if ffprobe is None:
+            return None
+        if isinstance(file_path, tuple):
+            # 檔案物件只有在磁碟上有實際路徑時才交給 ffprobe（例如以 open() 開啟的檔案），
+            # 只存在於記憶體中的內容改由 pydub 處理，不為了探測而整個讀入
+            name = getattr(file_path[1], 'name', None)
+            if not isinstance(name, str) or not os.path.isfile(name):
+                return None
+            file_path = name
+        try:
+            process = subprocess.run(
+                [ffprobe, "-v", "error", "-show_entries", "format=duration",
+                 "-of", "default=noprint_wrappers=1:nokey=1", file_path],
+                check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            return float(process.stdout.strip()) or None
+        except (subprocess.SubprocessError, OSError, ValueError):
+            return None
+    
+    def transcribe(self, file_path: AudioSource, api_key: str, language: str = "zh", **kwargs) -> str:
         """
         使用Whisper API轉錄單個音頻文件
         
         Args:
-            file_path: 音頻檔案路徑
+            file_path: 音頻檔案路徑，或 (檔名, 檔案物件)
             api_key: OpenAI API金鑰
             language: 語言代碼 (zh/en/ja等)
             
@@ -56,13 +187,23 @@ class SRTGenerator:
             client = openai.OpenAI(api_key=api_key)
             
             # 打開音頻文件並調用API
-            with open(file_path, "rb") as audio_file:
+            if isinstance(file_path, tuple):
+                name, audio_file = file_path
+                audio_file.seek(0)
                 response = client.audio.transcriptions.create(
                     model="whisper-1",
-                    file=audio_file,
+                    file=(os.path.basename(name), audio_file),
                     response_format="srt",
                     language=language
                 )
+            else:
+                with open(file_path, "rb") as audio_file:
+                    response = client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=audio_file,
+                        response_format="srt",
+                        language=language
+                    )
             
             # 返回結果
             return str(response)
@@ -92,27 +233,20 @@ class SRTGenerator:
             
         # 獲取字幕的總時間
         last_entry = parsed[-1]
-        subtitle_end_time = self.time_to_ms(last_entry['end_time'])
+        subtitle_end_time = last_entry.end_ms
+        if not subtitle_end_time:
+            return srt_content
         
         # 計算校正因子 (音頻實際長度/字幕顯示的長度)
         correction_factor = (audio_duration * 1000) / subtitle_end_time
         
         # 應用校正
         for entry in parsed:
-            start_ms = int(self.time_to_ms(entry['start_time']) * correction_factor)
-            end_ms = int(self.time_to_ms(entry['end_time']) * correction_factor)
-            
-            entry['start_time'] = self.ms_to_time(start_ms)
-            entry['end_time'] = self.ms_to_time(end_ms)
+            entry.start_ms = int(entry.start_ms * correction_factor)
+            entry.end_ms = int(entry.end_ms * correction_factor)
         
         # 更新SRT內容
-        corrected_content = ""
-        for entry in parsed:
-            corrected_content += f"{entry['index']}\n"
-            corrected_content += f"{entry['start_time']} --> {entry['end_time']}\n"
-            corrected_content += f"{entry['text']}\n\n"
-        
-        return corrected_content
+        return _format_srt(parsed)
     
     def time_to_ms(self, time_str: str) -> int:
         """將SRT時間格式轉換為毫秒
@@ -136,12 +270,9 @@ class SRTGenerator:
         Returns:
             SRT格式的時間字符串
         """
-        seconds, ms = divmod(ms, 1000)
-        minutes, seconds = divmod(seconds, 60)
-        hours, minutes = divmod(minutes, 60)
-        return f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d},{int(ms):03d}"
+        return _fmt_ts(ms)
     
-    def parse_srt(self, srt_content: str) -> List[Dict]:
+    def parse_srt(self, srt_content: str) -> List[SrtEntry]:
         """
         解析SRT內容為結構化數據
         
@@ -149,171 +280,143 @@ class SRTGenerator:
             srt_content: SRT字幕內容
             
         Returns:
-            列表，每個元素包含序號、時間戳、文本
+            SrtEntry 列表，每個元素包含序號、開始/結束毫秒、文本
         """
-        pattern = r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n((?:.+\n)+)'
-        matches = re.findall(pattern, srt_content, re.MULTILINE)
+        return list(_iter_srt_entries(srt_content))
+    
+    def _transcribe_file(self, file_path: AudioSource, api_key: str, language: str) -> Optional[Dict]:
+        """轉錄單個音頻文件為SRT內容
         
-        parsed = []
-        for match in matches:
-            index = int(match[0])
-            start_time = match[1]
-            end_time = match[2]
-            text = match[3].strip()
+        Args:
+            file_path: 音頻檔案路徑，或 (檔名, 檔案物件)；檔案物件使用後會被關閉
+            api_key: OpenAI API金鑰
+            language: 語言代碼
             
-            parsed.append({
-                'index': index,
-                'start_time': start_time,
-                'end_time': end_time,
-                'text': text
-            })
+        Returns:
+            SRT信息字典（內容與音頻時長），轉錄失敗時返回 None
+        """
+        try:
+            # 獲取音頻時長
+            audio_duration = self.get_audio_duration(file_path)
+            
+            # 使用Whisper API轉錄
+            srt_content = self.transcribe(file_path, api_key, language)
+        finally:
+            if isinstance(file_path, tuple):
+                file_path[1].close()
+        
+        if not srt_content:
+            return None
         
-        return parsed
+        # 校正時間戳
+        if audio_duration:
+            srt_content = self.correct_timestamps_proportionally(srt_content, audio_duration)
+        
+        return {
+            'content': srt_content,
+            'duration': audio_duration
+        }
     
-    def generate_srt_from_audio_files(self, audio_files: List[str], output_file: str, api_key: str, language: str = "zh") -> Tuple[bool, Optional[str]]:
+    def generate_srt_from_audio_files(self, audio_files: Iterable[AudioSource], output_file: Optional[str], api_key: str,
+                                      language: str = "zh", max_workers: int = 4) -> Tuple[bool, Optional[str], Optional[str]]:
         """從多個音頻文件生成合併的SRT
         
+        audio_files 也可以是逐一產生音頻來源的生成器（例如邊解壓邊產生），
+        每個文件一到達就送出轉錄，最多同時進行 max_workers 個請求。
+        音頻來源可以是檔案路徑，或 (檔名, 檔案物件)。
+        
         Args:
-            audio_files: 音頻文件路徑列表
-            output_file: 輸出SRT文件路徑
+            audio_files: 音頻來源列表或可迭代物件
+            output_file: 輸出SRT文件路徑；為 None 時不寫入檔案
             api_key: OpenAI API金鑰
             language: 語言代碼
+            max_workers: 同時進行的轉錄請求數
             
         Returns:
-            (成功狀態, SRT檔案路徑或錯誤訊息)
+            (成功狀態, SRT檔案路徑或錯誤訊息, 合併後的SRT內容)
         """
         try:
-            if not audio_files:
-                return False, "未提供音頻文件"
-            
             # 排序文件 (假設文件名格式為數字開頭，如 "01.mp3", "02.mp3")
-            sorted_files = sorted(audio_files, key=lambda x: int(re.search(r'^\d+', os.path.basename(x)).group()) if re.search(r'^\d+', os.path.basename(x)) else float('inf'))
+            # 生成器輸入則依產生順序處理
+            if isinstance(audio_files, (list, tuple)):
+                audio_files = sorted(audio_files, key=_leading_number)
             
-            # 為每個文件生成SRT
-            temp_dir = tempfile.mkdtemp()
-            srt_files = {}
+            # 為每個文件生成SRT（只保留在記憶體中，合併時直接使用）
+            submitted = []
             
-            for i, file_path in enumerate(sorted_files):
-                filename = os.path.basename(file_path)
-                srt_path = os.path.join(temp_dir, f"{i+1}.srt")
-                
-                print(f"處理文件 {i+1}/{len(sorted_files)}: {filename}")
-                
-                # 獲取音頻時長
-                audio_duration = self.get_audio_duration(file_path)
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for i, file_path in enumerate(audio_files):
+                    filename = _source_name(file_path)
+                    
+                    print(f"處理文件 {i+1}: {filename}")
+                    future = executor.submit(self._transcribe_file, file_path, api_key, language)
+                    submitted.append((filename, future))
                 
-                # 使用Whisper API轉錄
-                srt_content = self.transcribe(file_path, api_key, language)
+                if not submitted:
+                    return False, "未提供音頻文件", None
                 
-                if srt_content:
-                    # 校正時間戳
-                    if audio_duration:
-                        srt_content = self.correct_timestamps_proportionally(srt_content, audio_duration)
-                    
-                    # 保存SRT文件
-                    with open(srt_path, "w", encoding="utf-8") as f:
-                        f.write(srt_content)
-                    
-                    srt_files[filename] = {
-                        'path': srt_path,
-                        'content': srt_content,
-                        'duration': audio_duration
-                    }
-                else:
-                    print(f"無法轉錄: {filename}")
+                # 依提交順序收集結果
+                srt_files = {}
+                for filename, future in submitted:
+                    srt_info = future.result()
+                    if srt_info:
+                        srt_files[filename] = srt_info
+                    else:
+                        print(f"無法轉錄: {filename}")
             
             if not srt_files:
-                return False, "無法生成任何SRT文件"
+                return False, "無法生成任何SRT文件", None
             
             # 合併SRT文件
             merged_content = self._merge_srt(srt_files, language)
             
-            # 保存合併後的SRT
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(merged_content)
+            # 保存合併後的SRT（未指定輸出路徑時只返回內容）
+            if output_file:
+                with open(output_file, "w", encoding="utf-8") as f:
+                    f.write(merged_content)
             
-            return True, output_file
+            return True, output_file, merged_content
         
         except Exception as e:
-            return False, f"處理音頻文件失敗: {str(e)}"
+            return False, f"處理音頻文件失敗: {str(e)}", None
     
     def _merge_srt(self, srt_files: Dict, language: str = "zh") -> str:
         """
         合併多個SRT文件
         
         Args:
-            srt_files: SRT文件信息字典
+            srt_files: 檔名到SRT信息（content）的字典
             language: 語言代碼
             
         Returns:
             合併後的SRT內容
         """
-        all_entries = []
+        # 將合併的條目轉換回SRT格式
+        return _format_srt(self._iter_merged_entries(srt_files, language))
+    
+    def _iter_merged_entries(self, srt_files: Dict, language: str) -> Iterator[SrtEntry]:
+        """依音頻順序逐一產生合併後的條目，套用時間偏移、重新編號並轉換標點"""
+        index = 0
         last_end_time = 0
         
-        # 準備文件列表
-        files_list = []
-        for filename, data in srt_files.items():
-            files_list.append((filename, data['path']))
-        
-        # 定義中文標點替換映射
-        punctuation_map = {
-            ',': '，',  # 逗號
-            '.': '。',  # 句號
-            ':': '：',  # 冒號
-            '?': '？',  # 問號
-            '!': '！',  # 感嘆號
-        }
-        
-        # 按照文件名排序
-        sorted_files = sorted(files_list, key=lambda x: os.path.basename(x[0]))
-        
-        for filename, file_path in sorted_files:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                srt_content = f.read()
-            
-            parsed = self.parse_srt(srt_content)
-            
-            if not parsed:
-                continue
-            
-            # 調整時間戳
-            if all_entries:
-                # 計算時間偏移量
-                first_entry_start = self.time_to_ms(parsed[0]['start_time'])
-                time_offset = last_end_time - first_entry_start
+        # 字典已依音頻順序插入
+        for data in srt_files.values():
+            time_offset = None
+            for entry in _iter_srt_entries(data['content']):
+                # 以每個文件的第一個條目計算時間偏移量（第一個文件不偏移）
+                if time_offset is None:
+                    time_offset = last_end_time - entry.start_ms if index else 0
+                entry.start_ms += time_offset
+                entry.end_ms += time_offset
                 
-                # 應用偏移量
-                for entry in parsed:
-                    start_ms = self.time_to_ms(entry['start_time']) + time_offset
-                    end_ms = self.time_to_ms(entry['end_time']) + time_offset
-                    
-                    entry['start_time'] = self.ms_to_time(start_ms)
-                    entry['end_time'] = self.ms_to_time(end_ms)
-            
-            # 更新序號
-            start_index = len(all_entries) + 1
-            for i, entry in enumerate(parsed, start_index):
-                entry['index'] = i
+                # 更新序號
+                index += 1
+                entry.index = index
                 
                 # 如果是中文，將半形標點替換為全形標點
                 if language == "zh":
-                    text = entry['text']
-                    for half_width, full_width in punctuation_map.items():
-                        text = text.replace(half_width, full_width)
-                    entry['text'] = text
-            
-            # 記錄最後一個條目的結束時間
-            if parsed:
-                last_end_time = self.time_to_ms(parsed[-1]['end_time'])
-            
-            all_entries.extend(parsed)
-        
-        # 將合併的條目轉換回SRT格式
-        merged_content = ""
-        for entry in all_entries:
-            merged_content += f"{entry['index']}\n"
-            merged_content += f"{entry['start_time']} --> {entry['end_time']}\n"
-            merged_content += f"{entry['text']}\n\n"
-        
-        return merged_content
\ No newline at end of file
+                    entry.text = entry.text.translate(_ZH_PUNCT_TABLE)
+                
+                # 記錄最後一個條目的結束時間
+                last_end_time = entry.end_ms
+                yield entry
\ No newline at end of file
@@ -1,11 +1,78 @@
 # modules/subtitle_corrector.py
-import google.generativeai as genai
 import pysrt
 import re
 import os
+import threading
 import time
-from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterator, List, Tuple, Optional, Union
 from prompts.zh_prompt import SUBTITLE_CORRECTION_PROMPT
+from utils.api_handler import generate_text
+
+# 字幕校正使用的 Gemini 模型
+CORRECTION_MODEL = 'gemini-2.0-flash-exp'
+
+# SRT 條目之間的空行（允許只含空白的行）
+_BLOCK_SEP_RE = re.compile(r'\n\s*\n')
+# SRT 時間行：開始與結束時間，結尾允許空白
+_TIMING_RE = re.compile(r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})[ \t]*$')
+def _ts_parts(ts: str) -> Tuple[int, int, int, int]:
+    """將 _TIMING_RE 擷取的時間 (00:00:00,000) 拆成 (時, 分, 秒, 毫秒)"""
+    return int(ts[0:2]), int(ts[3:5]), int(ts[6:8]), int(ts[9:12])
+
+def _iter_srt_entries(srt_text: str) -> Iterator[Tuple[int, str, str, str]]:
+    """逐一產生 (序號, 開始時間, 結束時間, 文本)
+    
+    與 srt_generator._iter_srt_entries 相同以空行分割條目；沒有文本的條目保留為空字串。
+    """
+    for block in _BLOCK_SEP_RE.split(srt_text):
+        lines = block.strip('\n').split('\n', 2)
+        if len(lines) < 2 or not lines[0].strip().isdigit():
+            continue
+        timing = _TIMING_RE.match(lines[1])
+        if not timing:
+            continue
+        text = lines[2].strip() if len(lines) > 2 else ""
+        yield int(lines[0]), timing.group(1), timing.group(2), text
+
+# 連續的 SSML 標籤與空白
+_PREPROC_RE = re.compile(r'(?:<[^>]*?>|\s)+')
+# 只由 SSML 標籤組成（不含標籤外空白）
+_TAGS_ONLY_RE = re.compile(r'(?:<[^>]*?>)+')
+def _collapse_tags_and_spaces(match) -> str:
+    """標籤直接移除；夾雜標籤外空白的片段替換為一個空格"""
+    return '' if _TAGS_ONLY_RE.fullmatch(match.group(0)) else ' '
+
+# 校正結果中的字幕行
+_LINE_RE = re.compile(r'(?:處理→ )?編號(\d+):(.*)')
+# 字幕與報告之間的分隔符號
+_SEP_RE = re.compile(r'<<<分隔符號>>>')
+
+# 每分鐘最多送出的 Gemini 請求數（原本逐批等待 5 秒，約等於每分鐘 12 次）
+GEMINI_REQUESTS_PER_MINUTE = 12
+
+class _RequestPacer:
+    """讓並行的請求依固定間隔依序起跑，避免同時觸發 API 限流
+    
+    每個呼叫 wait() 的執行緒會預約下一個可用時段，只等待自己的時段，
+    因此請求本身的延遲可以互相重疊。
+    """
+    
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+    
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+# 同一行程內所有字幕校正共用，批次處理多個檔案時也不會超過限制
+_gemini_pacer = _RequestPacer(GEMINI_REQUESTS_PER_MINUTE)
 
 class SubtitleCorrector:
     def __init__(self, api_key: str):
@@ -14,32 +81,59 @@ class SubtitleCorrector:
         Args:
             api_key: Google Gemini API金鑰
         """
+        if not api_key:
+            raise ValueError("API 金鑰錯誤，請檢查設定: 未提供 Gemini API 金鑰")
+        # 金鑰隨每個請求傳送，不使用 google.generativeai 的全域設定，
+        # 不同金鑰的校正器可以在同一個行程內同時使用
         self.api_key = api_key
-        try:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        except Exception as e:
-            raise ValueError(f"API 金鑰錯誤，請檢查設定: {e}")
+        self.model = CORRECTION_MODEL
     
     @staticmethod
-    def parse_srt(srt_path: str) -> Optional[Dict]:
+    def parse_srt(srt_path: Union[str, BinaryIO]) -> Optional[Dict]:
         """解析SRT檔案
         
         Args:
-            srt_path: SRT檔案路徑
+            srt_path: SRT檔案路徑，或已開啟的二進位檔案物件（如 io.BytesIO）
             
         Returns:
             字幕數據字典或None(如果解析失敗)
         """
         try:
-            subs = pysrt.open(srt_path, encoding='utf-8')
-            srt_data = {}
-            for sub in subs:
-                srt_data[sub.index] = {"time": str(sub.start) + " --> " + str(sub.end), "text": sub.text}
-            return srt_data
+            if hasattr(srt_path, 'read'):
+                srt_text = srt_path.read().decode('utf-8-sig')
+            else:
+                with open(srt_path, 'r', encoding='utf-8-sig') as f:
+                    srt_text = f.read()
         except Exception as e:
             print(f"解析字幕檔案錯誤: {e}")
             return None
+        return SubtitleCorrector.parse_srt_text(srt_text)
+    
+    @staticmethod
+    def parse_srt_text(srt_text: str) -> Optional[Dict]:
+        """解析記憶體中的SRT內容
+        
+        Args:
+            srt_text: SRT字幕內容
+            
+        Returns:
+            字幕數據字典或None(如果解析失敗)
+        """
+        try:
+            # 統一換行符號
+            srt_text = srt_text.lstrip('\ufeff').replace('\r\n', '\n')
+            return {
+                index: {
+                    "time": f"{start} --> {end}",
+                    "text": text,
+                    "start": _ts_parts(start),
+                    "end": _ts_parts(end)
+                }
+                for index, start, end, text in _iter_srt_entries(srt_text)
+            }
+        except Exception as e:
+            print(f"解析字幕內容錯誤: {e}")
+            return None
     
     @staticmethod
     def preprocess_transcript(transcript: str) -> str:
@@ -51,18 +145,11 @@ class SubtitleCorrector:
         Returns:
             處理後的逐字稿文本
         """
-        # 移除 SSML 標籤
-        transcript = re.sub(r'<[^>]*?>', '', transcript)
-        
-        # 移除多個連續空格
-        transcript = re.sub(r'\s+', ' ', transcript)
-        
-        # 簡單地將換行替換為空格
-        transcript = transcript.replace('\n', ' ')
+        # 單次掃描：移除 SSML 標籤，連續空白（含換行）合併為一個空格
+        transcript = _PREPROC_RE.sub(_collapse_tags_and_spaces, transcript)
         
         # 移除文字前後的空白
-        transcript = transcript.strip()
-        return transcript
+        return transcript.strip()
     
     @staticmethod
     def validate_srt(original_srt: Dict, modified_srt: Dict) -> Tuple[bool, str]:
@@ -75,53 +162,154 @@ class SubtitleCorrector:
         Returns:
             (是否有效, 錯誤信息)
         """
-        # 檢查編號完整性
-        if set(original_srt.keys()) != set(modified_srt.keys()):
-            missing = set(original_srt.keys()) - set(modified_srt.keys())
-            extra = set(modified_srt.keys()) - set(original_srt.keys())
+        # 檢查編號完整性（字典鍵視圖直接做集合比較，不另外建立集合）
+        original_keys = original_srt.keys()
+        modified_keys = modified_srt.keys()
+        if original_keys != modified_keys:
+            missing = original_keys - modified_keys
+            extra = modified_keys - original_keys
             return False, f"編號不匹配: 缺少 {missing}, 多出 {extra}"
         
+        # 依編號配對原始與修改後的條目，只查找一次
+        pairs = [(idx, orig, modified_srt[idx]) for idx, orig in original_srt.items()]
+        
         # 檢查時間戳保持不變
-        for idx in original_srt:
-            if original_srt[idx]['time'] != modified_srt[idx]['time']:
+        for idx, orig, mod in pairs:
+            if orig['time'] != mod['time']:
                 return False, f"編號 {idx} 的時間戳被修改"
         
         # 檢查文字長度變化不太大
-        for idx in original_srt:
-            orig_len = len(original_srt[idx]['text'])
-            mod_len = len(modified_srt[idx]['text'])
+        for idx, orig, mod in pairs:
+            orig_len = len(orig['text'])
+            mod_len = len(mod['text'])
             # 允許30%的文字長度變化
             if abs(orig_len - mod_len) / max(1, orig_len) > 0.3:
                 return False, f"編號 {idx} 的文字長度變化過大: 原 {orig_len}, 現 {mod_len}"
         
         return True, "驗證通過"
     
-    def correct_subtitles(self, transcript_file: str, srt_file: str, batch_size: int = 20) -> Tuple[Optional[str], Optional[pysrt.SubRipFile], Optional[List[str]]]:
+    def _correct_batch(self, batch_no: int, batch_keys: List[int], context_keys: List[int],
+                       srt_data: Dict, transcript_content: str) -> Tuple[Dict[int, str], List[str]]:
+        """校正單一批次的字幕
+        
+        Args:
+            batch_no: 批次序號（從0開始）
+            batch_keys: 本批次需要處理的字幕編號
+            context_keys: 作為上下文的前一批次字幕編號
+            srt_data: 原始字幕數據
+            transcript_content: 預處理後的逐字稿
+            
+        Returns:
+            (編號到校正後文字的字典, 修改報告行列表)
+        """
+        # 準備本批次處理的數據
+        batch_with_context = context_keys + batch_keys
+        
+        # 在提示中標記哪些是實際需要處理的部分(非上下文)
+        subtitle_lines = []
+        for key in batch_with_context:
+            prefix = "處理→ " if key in batch_keys else "上下文: "
+            subtitle_lines.append(f"{prefix}編號{key}:{srt_data[key]['text']}")
+        
+        subtitle_content = "\n".join(subtitle_lines)
+        
+        # 使用來自prompts/zh_prompt.py的提示詞模板
+        prompt = SUBTITLE_CORRECTION_PROMPT.format(
+            subtitle_content=subtitle_content,
+            transcript_content=transcript_content
+        )
+        
+        # 添加重試機制與間隔時間
+        max_retries = 3
+        retry_count = 0
+        retry_delay = 5  # 遇到 429 時的初始等待秒數
+        
+        while retry_count < max_retries:
+            try:
+                # 依共用的時段起跑以避免觸發限流
+                _gemini_pacer.wait()
+                
+                corrected_subtitle = generate_text(prompt, self.api_key, model=self.model)
+                print(f"第 {batch_no + 1} 批次 Gemini 模型的回應：")
+                print(corrected_subtitle)
+                break  # 成功獲取回應，跳出重試循環
+                
+            except Exception as retry_error:
+                retry_count += 1
+                if "429" in str(retry_error):
+                    if retry_count >= max_retries:
+                        raise retry_error
+                    print(f"遇到配額限制 (429)，{retry_delay} 秒後重試 {retry_count}/{max_retries}...")
+                    time.sleep(retry_delay)
+                    retry_delay *= 2  # 指數退避策略
+                else:
+                    # 其他錯誤，直接拋出
+                    raise retry_error
+        
+        # 分割字幕和報告
+        parts = _SEP_RE.split(corrected_subtitle, maxsplit=1) # 只分割一次
+        
+        # 改進的字幕解析方法
+        corrected_lines = parts[0].strip().split('\n')
+        
+        # 記錄本批次校正後的字幕
+        corrections = {}
+        
+        for line in corrected_lines:
+            # 確保只處理「處理→」標記的編號字幕行
+            match = _LINE_RE.match(line)
+            if match:
+                index = int(match.group(1))
+                corrected_text = match.group(2).strip()
+                
+                # 確保此編號在當前批次中且需要處理
+                if index in batch_keys:
+                    corrections[index] = corrected_text
+        
+        # 處理報告部分
+        report_lines = []
+        if len(parts) > 1:
+            report = parts[1] # 取得修改清單文字
+            report_lines = report.strip().split('\n')
+        
+        return corrections, report_lines
+    
+    def correct_subtitles(self, transcript_file: Optional[str], srt_file: Optional[str], batch_size: int = 20,
+                          transcript_text: Optional[str] = None, srt_text: Optional[str] = None,
+                          max_workers: int = 1) -> Tuple[Optional[str], Optional[pysrt.SubRipFile], Optional[List[str]]]:
         """進行字幕校正處理
         
+        提供 transcript_text / srt_text 時直接使用記憶體中的內容，不讀取對應檔案。
+        各批次的上下文取自原始字幕，因此可以同時送出最多 max_workers 個批次。
+        
         Args:
             transcript_file: 逐字稿文件路徑
             srt_file: SRT文件路徑
             batch_size: 批次大小
+            transcript_text: 逐字稿內容（可選，優先於 transcript_file）
+            srt_text: SRT內容（可選，優先於 srt_file）
+            max_workers: 同時送出的批次數
             
         Returns:
             (錯誤信息, 更新後的SRT對象, 修改報告列表)
         """
         # 檢查測試用逐字稿檔案是否存在
-        if not os.path.exists(transcript_file):
-            return f"錯誤: 找不到逐字稿檔案: {transcript_file}", None, None
-        else:
+        if transcript_text is None:
+            if not transcript_file or not os.path.exists(transcript_file):
+                return f"錯誤: 找不到逐字稿檔案: {transcript_file}", None, None
             with open(transcript_file, 'r', encoding='utf-8') as f:
-                transcript_content = f.read()
-            transcript_content = self.preprocess_transcript(transcript_content)
+                transcript_text = f.read()
+        transcript_content = self.preprocess_transcript(transcript_text)
 
         # 檢查測試用 srt 檔案是否存在
-        if not os.path.exists(srt_file):
-            return f"錯誤: 找不到口語稿檔案: {srt_file}", None, None
-        else:
+        if srt_text is None:
+            if not srt_file or not os.path.exists(srt_file):
+                return f"錯誤: 找不到口語稿檔案: {srt_file}", None, None
             original_srt_data = self.parse_srt(srt_file)
-            if original_srt_data is None:
-                return "錯誤: 解析口語稿檔案失敗，請確認檔案內容", None, None
+        else:
+            original_srt_data = self.parse_srt_text(srt_text)
+        if original_srt_data is None:
+            return "錯誤: 解析口語稿檔案失敗，請確認檔案內容", None, None
         
         # 創建工作副本
         srt_data = original_srt_data.copy()
@@ -133,7 +321,8 @@ class SubtitleCorrector:
         # 使用固定數量的重疊
         overlap = 2  # 固定重疊2條字幕
         
-        # 處理每個批次，使用固定重疊數量
+        # 先切出所有批次，上下文使用原始字幕，各批次之間互不依賴
+        batches = []
         for i in range(0, len(keys), batch_size - overlap):
             end_idx = min(i + batch_size, len(keys))
             batch_keys = keys[i:end_idx]
@@ -141,90 +330,35 @@ class SubtitleCorrector:
             # 確保前一批次的最後部分有重疊
             context_start = max(0, i - overlap)
             context_keys = keys[context_start:i] if i > 0 else []
+            batches.append((len(batches), batch_keys, context_keys))
+        
+        # 同時送出最多 max_workers 個批次，全部完成後才依批次順序套用結果
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [
+                executor.submit(self._correct_batch, batch_no, batch_keys, context_keys,
+                                srt_data, transcript_content)
+                for batch_no, batch_keys, context_keys in batches
+            ]
             
-            # 準備本批次處理的數據
-            batch_with_context = context_keys + batch_keys
-            context_batch_data = {key: srt_data[key] for key in batch_with_context}
-            
-            # 在提示中標記哪些是實際需要處理的部分(非上下文)
-            subtitle_lines = []
-            for key in batch_with_context:
-                prefix = "處理→ " if key in batch_keys else "上下文: "
-                subtitle_lines.append(f"{prefix}編號{key}:{context_batch_data[key]['text']}")
-            
-            subtitle_content = "\n".join(subtitle_lines)
+            for (batch_no, _, _), future in zip(batches, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    for pending in futures:
+                        pending.cancel()
+                    return f"第 {batch_no + 1} 批次修正過程失敗：{e}", None, None
+        
+        for (_, batch_keys, _), (corrections, report_lines) in zip(batches, results):
+            for index, corrected_text in corrections.items():
+                srt_data[index]['text'] = corrected_text
             
-            # 使用來自prompts/zh_prompt.py的提示詞模板
-            prompt = SUBTITLE_CORRECTION_PROMPT.format(
-                subtitle_content=subtitle_content,
-                transcript_content=transcript_content
-            )
+            # 檢查是否所有批次中的編號都被處理了
+            for index in batch_keys:
+                if index not in corrections:
+                    print(f"警告：編號 {index} 在AI處理後丟失，保持原始字幕內容")
             
-            try:
-                # 添加重試機制與間隔時間
-                max_retries = 3
-                retry_count = 0
-                retry_delay = 5  # 初始等待秒數
-                
-                while retry_count < max_retries:
-                    try:
-                        # 添加間隔時間以避免觸發限流
-                        if i > 0:
-                            print(f"等待 {retry_delay} 秒以避免達到API限制...")
-                            time.sleep(retry_delay)
-                        
-                        response = self.model.generate_content(prompt)
-                        corrected_subtitle = response.text
-                        print(f"第 {i // (batch_size - overlap) + 1} 批次 Gemini 模型的回應：")
-                        print(corrected_subtitle)
-                        break  # 成功獲取回應，跳出重試循環
-                        
-                    except Exception as retry_error:
-                        retry_count += 1
-                        if "429" in str(retry_error):
-                            print(f"遇到配額限制 (429)，重試 {retry_count}/{max_retries}...")
-                            retry_delay *= 2  # 指數退避策略
-                        else:
-                            # 其他錯誤，直接拋出
-                            raise retry_error
-                        
-                        if retry_count >= max_retries:
-                            raise retry_error
-                
-                # 使用 re.split 分割字幕和報告
-                parts = re.split(r'<<<分隔符號>>>', corrected_subtitle, maxsplit=1) # 只分割一次
-                
-                # 改進的字幕解析方法
-                corrected_lines = parts[0].strip().split('\n')
-                
-                # 建立一個映射表來追踪已處理的編號
-                processed_indices = set()
-                
-                for line in corrected_lines:
-                    # 確保只處理「處理→」標記的編號字幕行
-                    match = re.match(r'(?:處理→ )?編號(\d+):(.*)', line)
-                    if match:
-                        index = int(match.group(1))
-                        corrected_text = match.group(2).strip()
-                        
-                        # 確保此編號在當前批次中且需要處理
-                        if index in batch_keys:
-                            srt_data[index]['text'] = corrected_text
-                            processed_indices.add(index)
-                
-                # 檢查是否所有批次中的編號都被處理了
-                for index in batch_keys:
-                    if index not in processed_indices:
-                        print(f"警告：編號 {index} 在AI處理後丟失，保持原始字幕內容")
-                
-                # 處理報告部分
-                if len(parts) > 1:
-                    report = parts[1] # 取得修改清單文字
-                    report_lines = report.strip().split('\n')
-                    all_reports.extend(report_lines)
-
-            except Exception as e:
-                return f"第 {i // (batch_size - overlap) + 1} 批次修正過程失敗：{e}", None, None
+            all_reports.extend(report_lines)
         
         # 驗證修改後的SRT結構
         is_valid, error_msg = self.validate_srt(original_srt_data, srt_data)
@@ -234,10 +368,9 @@ class SubtitleCorrector:
         # 寫回 SRT 檔案
         new_subs = []
         for index, data in sorted(srt_data.items()):  # 確保按編號順序排序
-            time_str = data['time']
-            start_str, end_str = time_str.split(" --> ")
-            start = pysrt.srtitem.SubRipTime.from_string(start_str)
-            end = pysrt.srtitem.SubRipTime.from_string(end_str)
+            # 直接使用解析時拆好的時間，不再由 pysrt 重新解析字串
+            start = pysrt.SubRipTime(*data['start'])
+            end = pysrt.SubRipTime(*data['end'])
             new_subs.append(pysrt.SubRipItem(index=index, start=start, end=end, text=data['text']))
         
         # 將 new_subs 轉換為 SubRipFile 物件
@@ -1,7 +1,13 @@
-import re
+import string
 from prompts import TEXT_PREPROCESSING_PROMPTS
 from utils.api_handler import process_with_ai, APIError
 
+# 刪除所有合法 API 金鑰字元的轉換表，轉換後仍有剩餘字元即為格式不正確
+_API_KEY_DELETE_TABLE = str.maketrans('', '', string.ascii_letters + string.digits + '_-')
+
+# AI 回應開頭可能重複的提示詞說明
+_PROMPT_ECHO_PREFIXES = ('請處理以下逐字稿', 'Please process')
+
 class PreprocessingError(Exception):
     """文本預處理錯誤"""
     pass
@@ -40,7 +46,7 @@ def validate_api_key(api_key):
         raise PreprocessingError("API 金鑰不能為空")
     
     # 簡單的格式檢查，實際使用中可能需要更嚴格的驗證
-    if not re.match(r'^[A-Za-z0-9_\-]+$', api_key.strip()):
+    if api_key.strip().translate(_API_KEY_DELETE_TABLE):
         raise PreprocessingError("API 金鑰格式不正確")
     
     return True
@@ -56,24 +62,16 @@ def format_processed_text(processed_text):
     """
     # 清理文本，移除多餘空行和無關內容
     lines = processed_text.strip().split('\n')
-    result_lines = []
     
-    # 標記是否已經開始處理實際內容
-    content_started = False
-    
-    for line in lines:
-        # 跳過提示詞說明部分
-        if not content_started:
-            if line.strip() and not line.startswith('請處理以下逐字稿') and not line.startswith('Please process'):
-                content_started = True
-            else:
-                continue
-        
-        # 保留實際處理結果
-        result_lines.append(line)
+    # 找出第一行實際內容，跳過之前的空行與提示詞說明部分
+    start = next(
+        (i for i, line in enumerate(lines)
+         if line.strip() and not line.startswith(_PROMPT_ECHO_PREFIXES)),
+        len(lines)
+    )
     
-    # 合併並返回結果
-    return '\n'.join(result_lines)
+    # 保留實際處理結果並返回
+    return '\n'.join(lines[start:])
 
 def preprocess_text(text, language, api_key):
     """預處理文本
@@ -2,21 +2,71 @@
 
 import os
 import json
+import binascii
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import zipfile
-import tempfile
 from pathlib import Path
-import time
 import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+try:
+    import orjson  # 可選：較快的 JSON 編解碼，未安裝時使用標準庫 json
+except ImportError:
+    orjson = None
 
 # 導入全局配置
 from modules import HAILUO_GROUP_ID, TTS_VOICES, TTS_EMOTIONS, DEFAULT_PRONUNCIATION_DICT, AUDIO_SETTINGS
-logging.basicConfig(
-    filename='tts_debug.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from utils.tts_cache import TTSCache
+
+# 逐段落的請求/響應細節只在 DEBUG 等級輸出，格式化延後到實際需要記錄時才進行
+logger = logging.getLogger(__name__)
+
+# 將 MP3 複製進 ZIP 時使用的緩衝區大小
+ZIP_COPY_BUFSIZE = 1024 * 1024
+
+# 十六進位音訊分段解碼的大小（字元數，必須為偶數）；每段解碼後為 1 MiB，寫入時直接交給系統呼叫
+HEX_DECODE_CHUNK = 2 * 1024 * 1024
+
+def _write_hex_audio(hex_audio, output_filename):
+    """將 API 回傳的十六進位音訊分段解碼並寫入檔案，不另外配置整段音訊的位元組副本
+    
+    每次寫入的分段都大於預設緩衝區，因此直接寫入檔案描述符，不經過 BufferedWriter 複製。
+    """
+    with open(output_filename, 'wb', buffering=0) as f:
+        for i in range(0, len(hex_audio), HEX_DECODE_CHUNK):
+            f.write(binascii.unhexlify(hex_audio[i:i + HEX_DECODE_CHUNK]))
+
+def _dumps(obj):
+    """將物件序列化為 UTF-8 編碼的 JSON 位元組"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def _loads_response(response):
+    """解析 API 響應的 JSON；音訊以十六進位字串回傳，響應體積大，優先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+def _payload_prefix(voice_settings, audio_settings):
+    """預先序列化各段落共用的請求欄位，返回去掉結尾 "}" 的 JSON 位元組"""
+    base = {
+        "model": "speech-01-hd",
+        "stream": False,
+        "voice_setting": voice_settings,
+        "audio_setting": audio_settings
+    }
+    return _dumps(base)[:-1]
+
+@lru_cache(maxsize=8)
+def _custom_tone_entries(custom_entries):
+    """解析用戶輸入的發音詞條字串（以逗號分隔），同一字串只解析一次"""
+    entries = (entry.strip() for entry in custom_entries.split(','))
+    return tuple(entry for entry in entries if entry)  # 過濾空條目
 
 class TTSGenerationError(Exception):
     """TTS 生成過程中的錯誤"""
@@ -43,20 +93,45 @@ class TTSGenerator:
     # 使用全局語音ID映射
     VOICE_ID_MAP = TTS_VOICES
     
-    # 使用全局情緒列表
+    # 使用全局情緒列表（保留順序供介面選單使用，驗證時查詢集合）
     EMOTIONS = TTS_EMOTIONS
+    _EMOTION_SET = frozenset(TTS_EMOTIONS)
     
-    def __init__(self, api_key, group_id=HAILUO_GROUP_ID, output_dir=None):
+    # 允許的語速範圍
+    SPEED_RANGE = (0.5, 2.0)
+    
+    def __init__(self, api_key, group_id=HAILUO_GROUP_ID, output_dir=None, cache_dir=None):
         """初始化TTS生成器
         
         Args:
             api_key: Hailuo API 密鑰
             group_id: Hailuo Group ID，默認為全局配置的 HAILUO_GROUP_ID
             output_dir: 音頻文件輸出目錄，如果為None則使用臨時目錄
+            cache_dir: 段落語音快取目錄，如果為None則使用專案temp下的tts_cache
         """
         self.api_key = api_key
         self.group_id = group_id
         
+        # 請求 URL 與標頭只建立一次
+        self._url = f"https://api.minimaxi.chat/v1/t2a_v2?GroupId={group_id}"
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+        
+        # 共用連線池，各段落請求重用 keep-alive 連線，暫時性錯誤由 Retry 自動重試
+        self._session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["POST"]),
+            respect_retry_after_header=True,  # 429 時依伺服器指定的秒數等待
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+        self._session.mount("https://", adapter)
+        
         # 設置輸出目錄
         if output_dir:
             self.output_dir = Path(output_dir)
@@ -66,6 +141,14 @@ class TTSGenerator:
             project_root = Path(__file__).parent.parent
             self.output_dir = project_root / "temp" / "audio"
             os.makedirs(self.output_dir, exist_ok=True)
+        
+        # 逐段落的檔案路徑以字串組合，避免每段重複建立 Path 物件
+        self._output_dir_str = str(self.output_dir)
+        
+        # 段落語音快取，與輸出目錄分開（批次處理時每個檔案的輸出目錄不同，快取仍共用）
+        if cache_dir is None:
+            cache_dir = Path(__file__).parent.parent / "temp" / "tts_cache"
+        self.cache = TTSCache(cache_dir)
     
     def merge_pronunciation_dict(self, custom_entries=None):
         """合併用戶自定義發音詞條與預設字典
@@ -74,38 +157,105 @@ class TTSGenerator:
             custom_entries: 用戶自定義的發音詞條列表，格式為 ["字詞/(拼音)", ...]
             
         Returns:
-            dict: 合併後的發音字典
+            dict: 合併後的發音字典；沒有自定義詞條時直接返回預設字典（呼叫端不應修改）
         """
+        if not (custom_entries and isinstance(custom_entries, str) and custom_entries.strip()):
+            return self.DEFAULT_PRONUNCIATION_DICT
+        
+        # 將用戶輸入分割成單獨的條目
+        entries = _custom_tone_entries(custom_entries)
+        if not entries:
+            return self.DEFAULT_PRONUNCIATION_DICT
+        
+        # 只在需要合併時才複製預設字典；與預設重複的詞條只保留一次（保持原順序）
         pronunciation_dict = self.DEFAULT_PRONUNCIATION_DICT.copy()
+        pronunciation_dict["tone"] = list(dict.fromkeys([*pronunciation_dict["tone"], *entries]))
+        return pronunciation_dict
+
+    def split_segments(self, text):
+        """依照 "---" 分隔符號分割文本
+        
+        Args:
+            text: 以 "---" 分隔段落的文本
+            
+        Returns:
+            list: 去除空白後的非空段落列表
+        """
+        return list(filter(None, map(str.strip, text.split("---"))))
+    
+    def synth_one(self, segment, index, voice_settings, payload_prefix=None, mp3_filename=None):
+        """生成單一段落的語音文件
         
-        if custom_entries and isinstance(custom_entries, str) and custom_entries.strip():
-            # 將用戶輸入分割成單獨的條目
-            entries = [entry.strip() for entry in custom_entries.split(',')]
-            entries = [entry for entry in entries if entry]  # 過濾空條目
+        Args:
+            segment: 段落文本
+            index: 段落索引（從0開始），用於決定輸出文件名
+            voice_settings: 語音設定
+            payload_prefix: 預先序列化的共用請求欄位（見 _payload_prefix）
+            mp3_filename: 輸出文件路徑，未提供時依段落索引產生
+            
+        Returns:
+            str: 生成的 MP3 文件路徑
             
-            # 合併到默認字典
-            if entries:
-                pronunciation_dict["tone"] = pronunciation_dict["tone"] + entries
+        Raises:
+            TTSGenerationError: 段落語音生成失敗
+        """
+        print(f"\n開始處理段落 {index+1}")
         
-        return pronunciation_dict
+        # 生成MP3文件名
+        if mp3_filename is None:
+            mp3_filename = os.path.join(self._output_dir_str, f"{index+1:02d}.mp3")
+        
+        # 調用API生成語音
+        print(f"呼叫 API 生成語音...")
+        success = self.call_tts_api(
+            segment, 
+            voice_settings, 
+            self.DEFAULT_AUDIO_SETTINGS, 
+            {}, # 空字典，已停用發音字典功能
+            mp3_filename,
+            payload_prefix
+        )
+        
+        if success:
+            print(f"段落 {index+1} 語音生成成功")
+            return mp3_filename
+        
+        # 嘗試使用更簡短的文本
+        if len(segment) > 100:
+            short_segment = segment[:100] + "..."
+            print(f"嘗試使用縮短的段落文本...")
+            success = self.call_tts_api(
+                short_segment,
+                voice_settings,
+                self.DEFAULT_AUDIO_SETTINGS,
+                {},
+                mp3_filename,
+                payload_prefix
+            )
+            if success:
+                print(f"使用縮短文本成功生成語音")
+                return mp3_filename
+        
+        raise TTSGenerationError(f"無法生成語音: 段落 {index+1}，請檢查網絡和 API 密鑰")
 
     def generate_speech(self, text, voice_name="訓練長", emotion="neutral", 
-                       speed=1.0, custom_pronunciation=None, progress_callback=None):
-        """生成語音"""
-        # 首先測試 API 連接
-        print("開始 API 連接測試...")
-        if not self.test_api_connection():
-            raise TTSGenerationError("無法連接到 Hailuo API，請檢查網絡和 API 密鑰")
+                       speed=1.0, custom_pronunciation=None, progress_callback=None,
+                       max_workers=4):
+        """生成語音
         
+        各段落會以最多 max_workers 個請求同時送出，進度依完成的段落數回報，
+        全部完成後再依段落順序寫入 ZIP。不另外做連線測試，連線或金鑰錯誤
+        會在第一個失敗的段落回報。
+        """
         # 檢查參數
         if voice_name not in self.VOICE_ID_MAP:
             raise TTSGenerationError(f"無效的語音名稱: {voice_name}")
         
-        if emotion not in self.EMOTIONS:
+        if emotion not in self._EMOTION_SET:
             raise TTSGenerationError(f"無效的情緒設定: {emotion}")
         
-        if not 0.5 <= speed <= 2.0:
-            raise TTSGenerationError(f"語速必須在 0.5 到 2.0 之間")
+        if not self.SPEED_RANGE[0] <= speed <= self.SPEED_RANGE[1]:
+            raise TTSGenerationError(f"語速必須在 {self.SPEED_RANGE[0]} 到 {self.SPEED_RANGE[1]} 之間")
         
         # 應用語音設定
         voice_settings = self.DEFAULT_VOICE_SETTINGS.copy()
@@ -113,153 +263,166 @@ class TTSGenerator:
         voice_settings["speed"] = speed
         voice_settings["emotion"] = emotion
         
+        # 各段落只有文本不同，其餘請求欄位只序列化一次
+        payload_prefix = _payload_prefix(voice_settings, self.DEFAULT_AUDIO_SETTINGS)
+        
         # 清理輸出目錄中的舊文件
-        for file in self.output_dir.glob("*.mp3"):
-            os.remove(file)
+        with os.scandir(self._output_dir_str) as entries:
+            for entry in entries:
+                if entry.name.endswith('.mp3') and entry.is_file():
+                    os.unlink(entry.path)
         
         # 分割文本
-        segments = text.split("---")
-        segments = [seg.strip() for seg in segments if seg.strip()]
+        segments = self.split_segments(text)
         
         # 輸出段落資訊以便調試
         print(f"文本被分割為 {len(segments)} 個段落")
         for i, segment in enumerate(segments):
             print(f"段落 {i+1} ({len(segment)} 字符): {segment[:50]}...")
         
-        # 生成每個段落的語音
-        mp3_files = []
-        zip_path = self.output_dir / "audio_files.zip"
+        # 預先產生所有段落的文件名；超過 99 段時加寬補零位數，讓文件名排序與段落順序一致
+        width = max(2, len(str(len(segments))))
+        mp3_filenames = [
+            os.path.join(self._output_dir_str, f"{i:0{width}d}.mp3")
+            for i in range(1, len(segments) + 1)
+        ]
+        
+        # 相同文本的段落只生成一次，其餘段落完成後直接複製第一次生成的文件
+        first_index = {}
+        duplicates = []
+        for i, segment in enumerate(segments):
+            j = first_index.setdefault(segment, i)
+            if j != i:
+                duplicates.append((i, j))
+        
+        # 生成每個段落的語音（依段落索引放入預先配置的列表）
+        mp3_files = [None] * len(segments)
+        zip_path = os.path.join(self._output_dir_str, "audio_files.zip")
         
         try:
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
-                for i, segment in enumerate(segments):
-                    if progress_callback:
-                        progress = int((i / len(segments)) * 100)
-                        progress_callback(progress)
-                    
-                    print(f"\n開始處理段落 {i+1}/{len(segments)}")
-                    
-                    # 生成MP3文件名
-                    mp3_filename = self.output_dir / f"{str(i+1).zfill(2)}.mp3"
-                    
-                    # 調用API生成語音
-                    print(f"呼叫 API 生成語音...")
-                    success = self.call_tts_api(
-                        segment, 
-                        voice_settings, 
-                        self.DEFAULT_AUDIO_SETTINGS, 
-                        {}, # 空字典，已停用發音字典功能
-                        mp3_filename
-                    )
+            # 先刪除舊的ZIP而非直接覆寫，避免影響其他以硬連結共用此檔案的副本
+            try:
+                os.remove(zip_path)
+            except FileNotFoundError:
+                pass
+            
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor, \
+                    zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as zipf:
+                futures = {
+                    executor.submit(self.synth_one, segment, i, voice_settings, payload_prefix,
+                                    mp3_filenames[i]): i
+                    for segment, i in first_index.items()
+                }
+                
+                # 依完成順序更新進度，結果放回原本的段落位置
+                for done, future in enumerate(as_completed(futures), 1):
+                    try:
+                        mp3_files[futures[future]] = future.result()
+                    except Exception:
+                        # 取消尚未開始的段落，避免浪費 API 配額
+                        for pending in futures:
+                            pending.cancel()
+                        raise
                     
-                    if success:
-                        print(f"段落 {i+1} 語音生成成功")
-                        mp3_files.append(mp3_filename)
-                        zipf.write(mp3_filename, mp3_filename.name)
-                    else:
-                        # 嘗試使用更簡短的文本
-                        if len(segment) > 100:
-                            short_segment = segment[:100] + "..."
-                            print(f"嘗試使用縮短的段落文本...")
-                            success = self.call_tts_api(
-                                short_segment,
-                                voice_settings,
-                                self.DEFAULT_AUDIO_SETTINGS,
-                                {},
-                                mp3_filename
-                            )
-                            if success:
-                                print(f"使用縮短文本成功生成語音")
-                                mp3_files.append(mp3_filename)
-                                zipf.write(mp3_filename, mp3_filename.name)
-                                continue
-                        
-                        raise TTSGenerationError(f"無法生成語音: 段落 {i+1}")
+                    if progress_callback:
+                        progress_callback(int((done / len(futures)) * 100))
+                
+                # 重複的段落複製第一次生成的文件
+                for i, j in duplicates:
+                    shutil.copyfile(mp3_files[j], mp3_filenames[i])
+                    mp3_files[i] = mp3_filenames[i]
+                
+                # 依段落順序寫入 ZIP；MP3 已是壓縮資料，直接存放並以大緩衝區複製
+                for mp3_filename in mp3_files:
+                    info = zipfile.ZipInfo.from_file(mp3_filename, os.path.basename(mp3_filename))
+                    info.compress_type = zipfile.ZIP_STORED
+                    with open(mp3_filename, 'rb') as src, zipf.open(info, 'w') as dst:
+                        shutil.copyfileobj(src, dst, length=ZIP_COPY_BUFSIZE)
                 
                 # 完成
                 if progress_callback:
                     progress_callback(100)
             
-            # 將Path對象轉換為字符串
-            mp3_files_str = [str(f) for f in mp3_files]
-            return mp3_files_str, str(zip_path)
+            # 控制快取大小，每個任務只掃描一次
+            try:
+                self.cache.prune()
+            except OSError as e:
+                logger.warning("清理語音快取失敗: %s", e)
+            
+            return mp3_files, zip_path
         
         except Exception as e:
             # 發生錯誤時清理資源
-            if zip_path.exists():
+            if os.path.exists(zip_path):
                 os.remove(zip_path)
             raise TTSGenerationError(f"語音生成失敗: {str(e)}")
     
-    def call_tts_api(self, text, voice_settings, audio_settings, pronunciation_dict, output_filename):
-        """調用 Hailuo API 進行文本到語音的轉換"""
-        url = f"https://api.minimaxi.chat/v1/t2a_v2?GroupId={self.group_id}"
-        headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {self.api_key}"
-        }
+    def call_tts_api(self, text, voice_settings, audio_settings, pronunciation_dict, output_filename,
+                     payload_prefix=None):
+        """調用 Hailuo API 進行文本到語音的轉換
+        
+        payload_prefix 為 _payload_prefix 預先序列化的共用欄位，未提供時依設定即時產生；
+        每個段落只需序列化文本本身。相同請求內容的段落直接從快取取回，不呼叫 API。
+        """
+        url = self._url
+        headers = self._headers
     
         # 準備請求數據（已停用發音字典）
-        data = {
-        "model": "speech-01-hd",
-        "text": text,
-        "stream": False,
-        "voice_setting": voice_settings,
-        "audio_setting": audio_settings
-        }
+        if payload_prefix is None:
+            payload_prefix = _payload_prefix(voice_settings, audio_settings)
+        body = payload_prefix + b', "text": ' + _dumps(text) + b'}'
+        
+        # 文本與語音設定都相同的段落已生成過，直接使用快取
+        cache_key = TTSCache.key(body)
+        if self.cache.get(cache_key, output_filename):
+            logger.debug("使用快取語音: %s", cache_key)
+            return True
     
         # 輸出詳細請求資訊以供調試
-        print(f"請求 URL: {url}")
-        print(f"請求標頭: {headers}")
-        print(f"請求資料: {json.dumps(data, ensure_ascii=False, indent=2)}")
+        logger.debug("請求 URL: %s", url)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("請求資料: %s", body.decode('utf-8'))
     
         try:
             # 發送請求
-            response = requests.post(url, headers=headers, json=data)
+            response = self._session.post(url, headers=headers, data=body)
             
             # 詳細記錄響應
-            print(f"狀態碼: {response.status_code}")
-            print(f"響應標頭: {response.headers}")
+            logger.debug("狀態碼: %s", response.status_code)
+            logger.debug("響應標頭: %s", response.headers)
             
             # 嘗試獲取並記錄響應內容
             try:
-                response_data = response.json()
-                print(f"響應資料: {json.dumps(response_data, ensure_ascii=False, indent=2)}")
-            except json.JSONDecodeError:
-                print(f"無法解析 JSON 響應: {response.text}")
+                response_data = _loads_response(response)
+                logger.debug("響應資料: %s", response_data)
+            except ValueError:
+                logger.warning("無法解析 JSON 響應: %s", response.text)
             
             # 檢查狀態碼
             response.raise_for_status()
             
             # 確認存在適當的響應結構
             if "data" in response_data and "audio" in response_data["data"]:
-                hex_audio = response_data["data"]["audio"]
-                audio_data = bytes.fromhex(hex_audio)
-                
-                with open(output_filename, 'wb') as f:
-                    f.write(audio_data)
+                _write_hex_audio(response_data["data"]["audio"], output_filename)
+                self.cache.put(cache_key, output_filename)
                 return True
             else:
-                print(f"API 回應缺少音訊資料: {response_data}")
+                logger.warning("API 回應缺少音訊資料: %s", response_data)
                 return False
         
         except requests.exceptions.RequestException as e:
-            print(f"請求錯誤: {e}")
+            logger.error("請求錯誤: %s", e)
             if hasattr(e, 'response') and e.response:
-                print(f"錯誤響應: {e.response.text}")
+                logger.error("錯誤響應: %s", e.response.text)
             return False
-        except Exception as e:
-            print(f"文本到語音轉換失敗: {e}")
-            import traceback
-            print(traceback.format_exc())
+        except Exception:
+            logger.exception("文本到語音轉換失敗")
             return False    
             
     def test_api_connection(self):
         """測試 API 連接，返回是否可連接"""
-        url = f"https://api.minimaxi.chat/v1/t2a_v2?GroupId={self.group_id}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        url = self._url
+        headers = self._headers
         
         # 最簡單的測試請求
         data = {
@@ -271,7 +434,7 @@ class TTSGenerator:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = self._session.post(url, headers=headers, json=data)
             print(f"測試連接狀態碼: {response.status_code}")
             print(f"測試連接響應: {response.text}")
             
@@ -282,11 +445,8 @@ class TTSGenerator:
     
     def _text_to_speech(self, text, voice_settings, audio_settings, pronunciation_dict, output_filename):
         """調用 Hailuo API 進行文本到語音的轉換"""
-        url = f"https://api.minimaxi.chat/v1/t2a_v2?GroupId={self.group_id}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        url = self._url
+        headers = self._headers
         
         # 創建一個不含發音字典的請求版本進行測試
         basic_data = {
@@ -302,47 +462,34 @@ class TTSGenerator:
         full_data["pronunciation_dict"] = pronunciation_dict
         
         try:
-            # 首先嘗試完整版本
+            # 首先嘗試完整版本，每個段落只序列化一次
             try:
-                json_data = json.dumps(full_data, ensure_ascii=False)
-                print(f"完整數據 JSON 長度：{len(json_data)}")
-                
-                # 測試 JSON 是否有效
-                json.loads(json_data)
-                
-                data_to_use = full_data
-                print("使用完整數據（含發音字典）")
-            except json.JSONDecodeError as e:
-                print(f"完整數據 JSON 序列化錯誤: {e}")
-                print(f"嘗試使用不含發音字典的基礎數據")
+                final_json = _dumps(full_data)
+                logger.debug("完整數據 JSON 長度：%d，使用完整數據（含發音字典）", len(final_json))
+            except (TypeError, ValueError) as e:
+                logger.warning("完整數據 JSON 序列化錯誤: %s，改用不含發音字典的基礎數據", e)
                 
                 # 改用不含發音字典的基礎版本
-                json_data = json.dumps(basic_data, ensure_ascii=False)
-                data_to_use = basic_data
+                final_json = _dumps(basic_data)
             
             # 使用確認有效的數據發送請求
-            final_json = json.dumps(data_to_use, ensure_ascii=False)
-            response = requests.post(url, headers=headers, data=final_json, stream=True)
+            response = self._session.post(url, headers=headers, data=final_json)
             response.raise_for_status()
             
-            response_data = response.json()
+            response_data = _loads_response(response)
             
             if "data" in response_data and "audio" in response_data["data"]:
-                hex_audio = response_data["data"]["audio"]
-                audio_data = bytes.fromhex(hex_audio)
-                
-                with open(output_filename, 'wb') as f:
-                    f.write(audio_data)
+                _write_hex_audio(response_data["data"]["audio"], output_filename)
                 return True
             else:
-                print(f"API 回應缺少音訊資料: {response_data}")
+                logger.warning("API 回應缺少音訊資料: %s", response_data)
                 return False
         
         except requests.exceptions.RequestException as e:
-            print(f"請求錯誤: {e}")
+            logger.error("請求錯誤: %s", e)
             return False
         except Exception as e:
-            print(f"文本到語音轉換失敗: {e}")
+            logger.error("文本到語音轉換失敗: %s", e)
             return False
     
     
@@ -1,9 +1,7 @@
 import os
 import tempfile
 import gradio as gr
-from openai import OpenAI
 from datetime import timedelta
-from pydub import AudioSegment
 
 
 def format_time(seconds):
@@ -38,6 +36,10 @@ def audio_to_srt(audio_input, api_key):
         return None, "請輸入 OpenAI API 金鑰"
 
     try:
+        # 只在實際轉換時才載入 OpenAI 與 pydub，縮短介面啟動時間
+        from openai import OpenAI
+        from pydub import AudioSegment
+
         # 建立 OpenAI 客戶端
         client = OpenAI(api_key=api_key)
 
@@ -1,35 +1,62 @@
 # tests/test_api_call.py
 import os
 import sys
+import json
+import unittest
+from unittest.mock import patch, MagicMock
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.api_handler import call_google_ai
 from prompts import TEXT_PREPROCESSING_PROMPTS
 
-def test_google_ai_call():
-    # 從環境變量或直接輸入獲取API金鑰
-    api_key = input("請輸入Google API金鑰: ")
-    
-    # 測試文本
-    test_text = "這是一段測試文本。它包含多個句子。這是第三句，我們想看看它是如何被分段的。列舉項目：蘋果、香蕉、橙子、葡萄，這些水果都很美味。"
-    
+# 測試文本
+TEST_TEXT = "這是一段測試文本。它包含多個句子。這是第三句，我們想看看它是如何被分段的。列舉項目：蘋果、香蕉、橙子、葡萄，這些水果都很美味。"
+
+class TestGoogleAICallMocked(unittest.TestCase):
+    """以模擬的 HTTP 響應測試 call_google_ai，不需要網路與 API 金鑰"""
+
+    @patch('utils.api_handler._SESSION.post')
+    def test_google_ai_call_mocked(self, mock_post):
+        response_data = {
+            "candidates": [
+                {"content": {"parts": [{"text": "  處理後的文本  "}]}, "finishReason": "STOP"}
+            ]
+        }
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = response_data
+        mock_response.content = json.dumps(response_data).encode('utf-8')
+        mock_post.return_value = mock_response
+
+        result = call_google_ai(TEXT_PREPROCESSING_PROMPTS["zh"], TEST_TEXT, "test_api_key")
+
+        self.assertEqual(result, "處理後的文本")
+        mock_post.assert_called_once()
+        self.assertEqual(mock_post.call_args.kwargs['params'], {"key": "test_api_key"})
+
+def test_google_ai_call(api_key=None):
+    # 從參數或環境變量獲取API金鑰，未設定時略過實際的 API 呼叫
+    api_key = api_key or os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        raise unittest.SkipTest("未設定 GOOGLE_API_KEY，略過實際 API 測試")
+
     # 獲取中文提示詞
     prompt = TEXT_PREPROCESSING_PROMPTS["zh"]
-    
+
     try:
         # 調用API
         print("正在調用Google AI API...")
-        result = call_google_ai(prompt, test_text, api_key, model="gemini-2.0-flash")
-        
+        result = call_google_ai(prompt, TEST_TEXT, api_key, model="gemini-2.0-flash")
+
         # 打印結果
         print("\n===== API調用結果 =====")
         print(result)
         print("========================")
-        
+
         return True
     except Exception as e:
         print(f"錯誤: {str(e)}")
         return False
 
 if __name__ == "__main__":
-    test_google_ai_call()
\ No newline at end of file
+    test_google_ai_call(os.environ.get("GOOGLE_API_KEY") or input("請輸入Google API金鑰: "))
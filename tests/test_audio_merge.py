@@ -0,0 +1,88 @@
+# tests/test_audio_merge.py
+import unittest
+import os
+import sys
+import tempfile
+import subprocess
+from unittest.mock import patch
+
+# 確保可以導入專案模組
+sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from modules import audio_merge
+from modules.audio_merge import AudioMerger
+
+class TestAudioMerger(unittest.TestCase):
+
+    def setUp(self):
+        """測試前準備工作"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.merger = AudioMerger(output_dir=self.temp_dir.name)
+
+    def tearDown(self):
+        """測試後清理工作"""
+        self.temp_dir.cleanup()
+
+    def test_escape_filter_path_plain(self):
+        """一般路徑只需以單引號包住"""
+        self.assertEqual(
+            self.merger._escape_filter_path("/tmp/sub/simple.srt"),
+            "'/tmp/sub/simple.srt'"
+        )
+
+    def test_escape_filter_path_colon(self):
+        """冒號需轉義給濾鏡選項解析器"""
+        self.assertEqual(
+            self.merger._escape_filter_path("/tmp/a:b/sub.srt"),
+            "'/tmp/a\\:b/sub.srt'"
+        )
+
+    def test_escape_filter_path_windows_drive(self):
+        """Windows 磁碟機代號的冒號同樣需要轉義"""
+        self.assertEqual(
+            self.merger._escape_filter_path("C:/Users/test/sub.srt"),
+            "'C\\:/Users/test/sub.srt'"
+        )
+
+    def test_escape_filter_path_quote(self):
+        """單引號需先結束引號再轉義"""
+        self.assertEqual(
+            self.merger._escape_filter_path("/tmp/it's/sub.srt"),
+            "'/tmp/it'\\\\\\''s/sub.srt'"
+        )
+
+class TestRunVideoCmd(unittest.TestCase):
+    """NVENC 失敗時的改用 libx264 邏輯"""
+
+    def setUp(self):
+        patcher = patch.object(audio_merge, '_has_nvenc', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, audio_merge, '_nvenc_failed', False)
+        audio_merge._nvenc_failed = False
+
+    def _run_failing_nvenc(self, stderr):
+        """NVENC 命令以指定錯誤輸出失敗，libx264 命令成功"""
+        def fake_run(cmd, **kwargs):
+            if 'h264_nvenc' in cmd:
+                raise subprocess.CalledProcessError(1, cmd, stderr=stderr)
+            return subprocess.CompletedProcess(cmd, 0)
+
+        with patch.object(audio_merge.subprocess, 'run', side_effect=fake_run) as mock_run:
+            audio_merge._run_video_cmd(lambda encoder_args: ['ffmpeg', *encoder_args])
+        return [call.args[0][2] for call in mock_run.call_args_list]
+
+    def test_encoder_failure_disables_nvenc(self):
+        """NVENC 初始化失敗時改用 libx264，之後不再嘗試 NVENC"""
+        stderr = b"[h264_nvenc @ 0x1] No capable devices found\n"
+        self.assertEqual(self._run_failing_nvenc(stderr), ['h264_nvenc', 'libx264'])
+        self.assertTrue(audio_merge._nvenc_failed)
+
+    def test_other_failure_keeps_nvenc(self):
+        """與編碼器無關的錯誤只以 libx264 重試，不停用 NVENC"""
+        stderr = b"Unable to open /tmp/missing.srt\n"
+        self.assertEqual(self._run_failing_nvenc(stderr), ['h264_nvenc', 'libx264'])
+        self.assertFalse(audio_merge._nvenc_failed)
+
+if __name__ == '__main__':
+    unittest.main()
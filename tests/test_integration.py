@@ -46,11 +46,8 @@ class TestIntegration(unittest.TestCase):
     def _create_test_audio_zip(self, zip_path):
         """創建測試用的音頻ZIP文件"""
         with zipfile.ZipFile(zip_path, 'w') as zipf:
-            # 創建一個空的MP3文件
-            mp3_path = os.path.join(self.temp_dir.name, "test.mp3")
-            with open(mp3_path, 'wb') as f:
-                f.write(b'dummy_mp3_content')
-            zipf.write(mp3_path, os.path.basename(mp3_path))
+            # 直接寫入模擬的MP3內容，與正式流程相同不壓縮
+            zipf.writestr("test.mp3", b'dummy_mp3_content', compress_type=zipfile.ZIP_STORED)
     
     @patch('modules.tts_generator.TTSGenerator')
     def test_generate_tts(self, mock_tts_generator_class):
@@ -7,7 +7,8 @@ import tempfile
 from pathlib import Path
 import shutil
 import sys
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, create_autospec
+import requests
 
 # 確保可以導入專案模組
 sys.path.append(os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
@@ -65,17 +66,20 @@ class TestTTSGenerator(unittest.TestCase):
         self.assertIn("字詞1/(zici1)", merged_dict["tone"])
         self.assertIn("字詞2/(zici2)", merged_dict["tone"])
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_text_to_speech_success(self, mock_post):
         """測試成功的TTS轉換"""
-        # 模擬成功的API響應
-        mock_response = MagicMock()
-        mock_response.json.return_value = {
+        # 模擬成功的API響應（依 requests.Response 的介面建立，避免測試與實際介面脫節）
+        mock_response = create_autospec(requests.Response, instance=True)
+        mock_response.status_code = 200
+        response_data = {
             "data": {
                 "audio": "01020304"  # 16進制的音頻數據
             }
         }
-        mock_response.raise_for_status = MagicMock()
+        mock_response.json.return_value = response_data
+        mock_response.content = json.dumps(response_data).encode('utf-8')
+        mock_response.raise_for_status.return_value = None
         mock_post.return_value = mock_response
         
         # 調用TTS轉換
@@ -105,7 +109,7 @@ class TestTTSGenerator(unittest.TestCase):
         self.assertEqual(request_data['audio_setting'], self.tts_generator.DEFAULT_AUDIO_SETTINGS)
         self.assertEqual(request_data['pronunciation_dict'], self.tts_generator.DEFAULT_PRONUNCIATION_DICT)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_text_to_speech_api_error(self, mock_post):
         """測試API錯誤的處理"""
         # 模擬API錯誤
@@ -156,6 +160,26 @@ class TestTTSGenerator(unittest.TestCase):
         # 檢查進度回調是否被調用
         self.assertGreater(progress_callback.call_count, 0)
     
+    @patch('modules.tts_generator.TTSGenerator.call_tts_api', autospec=True)
+    def test_generate_speech_dedupes_segments(self, mock_call):
+        """測試相同文本的段落只呼叫一次API"""
+        def mock_call_side_effect(generator, text, voice_settings, audio_settings, pronunciation_dict,
+                                  output_filename, payload_prefix=None):
+            with open(output_filename, 'wb') as f:
+                f.write(text.encode('utf-8'))
+            return True
+        
+        mock_call.side_effect = mock_call_side_effect
+        
+        mp3_files, zip_path = self.tts_generator.generate_speech("甲---乙---甲---乙---甲")
+        
+        # 五個段落只有兩種文本
+        self.assertEqual(mock_call.call_count, 2)
+        self.assertEqual(len(mp3_files), 5)
+        for mp3_file, expected in zip(mp3_files, "甲乙甲乙甲"):
+            with open(mp3_file, 'rb') as f:
+                self.assertEqual(f.read().decode('utf-8'), expected)
+    
     @patch('modules.tts_generator.TTSGenerator._text_to_speech')
     def test_generate_speech_error(self, mock_tts):
         """測試生成語音出錯的情況"""
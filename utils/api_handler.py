@@ -1,17 +1,68 @@
 # utils/api_handler.py
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import os
-# from dotenv import load_dotenv # <-- REMOVE THIS
+from functools import lru_cache
+from typing import Optional, Tuple
 
-# 加載環境變量
-# load_dotenv() # <-- REMOVE THIS
+try:
+    import orjson  # 可選：較快的 JSON 編解碼，未安裝時使用標準庫 json
+except ImportError:
+    orjson = None
 
 class APIError(Exception):
     """API 調用錯誤"""
     pass
 
+# 所有 API 呼叫共用同一個連線池，重用 keep-alive 連線，省去每次請求的 TCP/TLS 握手
+# 暫時性錯誤（429/5xx）由 Retry 以指數退避自動重試，重試後仍失敗則交由下方的狀態碼檢查處理
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["POST"]),
+        raise_on_status=False
+    )
+))
+
+# API 端點 (使用 v1beta, 確認這是否是最新或推薦的版本)
+# Models list: https://ai.google.dev/models/gemini
+# Check if the model requires 'tunedModels' endpoint etc.
+# Assuming standard model endpoint for now.
+_GOOGLE_AI_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+# 請求頭 (Authorization header is NOT used here, key is a query parameter)
+_GOOGLE_AI_HEADERS = {
+    "Content-Type": "application/json",
+}
+
+# 生成設定，每次請求相同，只建立一次（僅供序列化，不應修改）
+_GOOGLE_AI_GENERATION_CONFIG = {
+    "temperature": 0.2,  # Lower temp for more deterministic output
+    "topP": 0.8,
+    "topK": 40,
+    "maxOutputTokens": 8192, # Set a reasonable max token limit if needed
+    # "stopSequences": ["..."] # Optional stop sequences
+}
+
+@lru_cache(maxsize=32)
+def _split_prompt(prompt: str) -> Optional[Tuple[str, str]]:
+    """{text} 是唯一的佔位符且沒有其他大括號時返回 (前段, 後段)，否則返回 None.
+
+    同一個提示詞模板只解析一次，之後以字串串接代替 str.format.
+    """
+    head, sep, tail = prompt.partition("{text}")
+    if not sep or "{" in head or "}" in head or "{" in tail or "}" in tail:
+        return None
+    return head, tail
+
 # --- Improved call_google_ai ---
 def call_google_ai(prompt: str, text: str, api_key: str, model: str = "gemini-1.5-flash") -> str: # Changed default model, added type hints
     """調用 Google AI API (Generative Language API) 進行文本處理.
@@ -36,9 +87,10 @@ def call_google_ai(prompt: str, text: str, api_key: str, model: str = "gemini-1.
          raise ValueError("提示詞模板 (prompt) 為空。")
     # Text can be empty, depending on the prompt's design
 
+    parts = _split_prompt(prompt)
     try:
         # 構建完整提示詞 (Safely format)
-        full_prompt = prompt.format(text=text)
+        full_prompt = parts[0] + text + parts[1] if parts else prompt.format(text=text)
     except KeyError:
          # If prompt doesn't contain {text}, handle gracefully or raise error
          print(f"警告: 提供的提示詞模板未包含 '{{text}}' 佔位符。將直接使用模板。")
@@ -47,17 +99,31 @@ def call_google_ai(prompt: str, text: str, api_key: str, model: str = "gemini-1.
          # If text placeholder is required:
          # raise ValueError("提示詞模板必須包含 '{text}' 佔位符。")
 
-    # API 端點 (使用 v1beta, 確認這是否是最新或推薦的版本)
-    # Models list: https://ai.google.dev/models/gemini
-    # Check if the model requires 'tunedModels' endpoint etc.
-    # Assuming standard model endpoint for now.
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+    return generate_text(full_prompt, api_key, model=model)
 
-    # 請求頭
-    headers = {
-        "Content-Type": "application/json",
-        # Authorization header is NOT used here, key is a query parameter
-    }
+def generate_text(full_prompt: str, api_key: str, model: str = "gemini-1.5-flash") -> str:
+    """以完整的提示詞調用 Google AI API (Generative Language API).
+
+    API 金鑰隨每個請求傳送，不經過 google.generativeai 的全域設定，
+    不同金鑰的請求可以在同一個行程內同時進行.
+
+    Args:
+        full_prompt (str): 已組合完成的提示詞.
+        api_key (str): Google AI API 金鑰.
+        model (str): 模型名稱，例如 "gemini-1.5-flash", "gemini-2.0-flash-exp".
+
+    Returns:
+        str: 模型生成的文本.
+
+    Raises:
+        APIError: API 調用或響應處理失敗.
+        ValueError: 如果 API Key 未提供.
+    """
+    if not api_key:
+         raise ValueError("Google AI API 金鑰未提供。")
+
+    url = _GOOGLE_AI_URL.format(model=model)
+    headers = _GOOGLE_AI_HEADERS
 
     # 請求參數 (API Key)
     params = {
@@ -77,13 +143,7 @@ def call_google_ai(prompt: str, text: str, api_key: str, model: str = "gemini-1.
                 ]
             }
         ],
-        "generationConfig": {
-            "temperature": 0.2,  # Lower temp for more deterministic output
-            "topP": 0.8,
-            "topK": 40,
-            "maxOutputTokens": 8192, # Set a reasonable max token limit if needed
-            # "stopSequences": ["..."] # Optional stop sequences
-        },
+        "generationConfig": _GOOGLE_AI_GENERATION_CONFIG,
         # Optional Safety Settings:
         # "safetySettings": [
         #    { "category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE" },
@@ -96,7 +156,10 @@ def call_google_ai(prompt: str, text: str, api_key: str, model: str = "gemini-1.
     try:
         print(f"調用 Google AI API: model={model}, url={url}") # Log call
         # Add timeout to the request
-        response = requests.post(url, headers=headers, params=params, json=data, timeout=90) # 90 seconds timeout
+        if orjson is not None:
+            response = _SESSION.post(url, headers=headers, params=params, data=orjson.dumps(data), timeout=90)
+        else:
+            response = _SESSION.post(url, headers=headers, params=params, json=data, timeout=90) # 90 seconds timeout
 
         # Check for non-200 status codes explicitly
         if response.status_code != 200:
@@ -110,7 +173,7 @@ def call_google_ai(prompt: str, text: str, api_key: str, model: str = "gemini-1.
              raise APIError(f"API 請求失敗 (HTTP {response.status_code}): {error_details}")
 
         # --- Process successful response (status code 200) ---
-        result = response.json()
+        result = orjson.loads(response.content) if orjson is not None else response.json()
 
         # Validate response structure and check for safety blocks or empty results
         if not result.get("candidates"):
@@ -153,6 +216,17 @@ def call_google_ai(prompt: str, text: str, api_key: str, model: str = "gemini-1.
     # Removed redundant JSONDecodeError catch, handled by status code check or RequestException
     # Removed redundant broad Exception catch, specific errors handled above
 
+def _google_ai_service(prompt: str, text: str, api_key: str, **kwargs) -> str:
+    """google_ai 服務：只傳入 call_google_ai 使用的參數."""
+    # Default to a known stable model if not provided
+    return call_google_ai(prompt=prompt, text=text, api_key=api_key,
+                          model=kwargs.get("model", "gemini-1.5-flash"))
+
+# 服務名稱到處理函數的對應；新增服務時在此註冊
+_AI_SERVICES = {
+    "google_ai": _google_ai_service,
+}
+
 # --- process_with_ai function seems fine, acts as a dispatcher ---
 def process_with_ai(service: str, prompt: str, text: str, api_key: str, **kwargs) -> str: # Added type hints
     """統一的 AI 模型調用介面.
@@ -171,22 +245,17 @@ def process_with_ai(service: str, prompt: str, text: str, api_key: str, **kwargs
         ValueError: 如果服務不支持或缺少必要參數 (如 api_key).
         APIError: 如果底層 API 調用失敗.
     """
-    if service == "google_ai":
-        # Default to a known stable model if not provided
-        model = kwargs.get("model", "gemini-1.5-flash")
-        if not api_key:
-             # Propagate the ValueError from the underlying function if key is missing
-             raise ValueError("調用 Google AI 需要提供 api_key。")
-        try:
-            # Pass only relevant args
-            return call_google_ai(prompt=prompt, text=text, api_key=api_key, model=model)
-        except ValueError as ve: # Catch potential ValueErrors from call_google_ai
-             raise ve
-        except APIError as ae: # Propagate APIError
-             raise ae
-        except Exception as e: # Catch unexpected errors during the call
-             import traceback
-             print(f"調用 process_with_ai (google_ai) 時發生未知錯誤: {traceback.format_exc()}")
-             raise APIError(f"調用 google_ai 時發生未知錯誤: {e}") from e
-    else:
-        raise ValueError(f"不支持的服務類型: {service}")
\ No newline at end of file
+    handler = _AI_SERVICES.get(service)
+    if handler is None:
+        raise ValueError(f"不支持的服務類型: {service}")
+    if not api_key:
+         # Propagate the ValueError from the underlying function if key is missing
+         raise ValueError(f"調用 {service} 需要提供 api_key。")
+    try:
+        return handler(prompt, text, api_key, **kwargs)
+    except (ValueError, APIError): # Propagate ValueError / APIError unchanged
+         raise
+    except Exception as e: # Catch unexpected errors during the call
+         import traceback
+         print(f"調用 process_with_ai ({service}) 時發生未知錯誤: {traceback.format_exc()}")
+         raise APIError(f"調用 {service} 時發生未知錯誤: {e}") from e
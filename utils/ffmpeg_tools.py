@@ -0,0 +1,35 @@
+# utils/ffmpeg_tools.py
+
+import os
+import shutil
+from functools import lru_cache
+
+
+def find_binary(name):
+    """尋找可執行檔的絕對路徑
+
+    Args:
+        name (str): 可執行檔名稱 (ffmpeg / ffprobe)
+
+    Returns:
+        str | None: 可執行檔路徑，找不到時返回 None
+    """
+    # 在 Hugging Face 環境中，優先檢查 /usr/bin
+    system_path = f"/usr/bin/{name}"
+    if os.access(system_path, os.X_OK):
+        return system_path
+
+    # 然後嘗試系統 PATH
+    return shutil.which(name)
+
+
+@lru_cache(maxsize=1)
+def ffmpeg_path():
+    """ffmpeg 路徑，每個行程只查找一次"""
+    return find_binary("ffmpeg")
+
+
+@lru_cache(maxsize=1)
+def ffprobe_path():
+    """ffprobe 路徑，每個行程只查找一次"""
+    return find_binary("ffprobe")
@@ -0,0 +1,83 @@
+# utils/tts_cache.py
+
+import os
+import shutil
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 語音快取的預設容量上限（位元組），超過時依最近使用時間淘汰最舊的檔案
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+class TTSCache:
+    """以請求內容雜湊值為鍵的語音檔案快取
+
+    每個鍵對應快取目錄下的一個 MP3 檔案；命中時更新修改時間，
+    prune() 依修改時間淘汰最久未使用的檔案。
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """初始化語音快取
+
+        Args:
+            cache_dir: 快取目錄
+            max_bytes: 快取總大小上限（位元組）
+        """
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(body):
+        """以完整請求內容（位元組）的 SHA-256 作為快取鍵值"""
+        return hashlib.sha256(body).hexdigest()
+
+    def path(self, key):
+        """返回鍵值對應的快取檔案路徑"""
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def get(self, key, output_filename):
+        """將快取的語音複製到 output_filename，返回是否命中"""
+        cache_path = self.path(key)
+        try:
+            shutil.copyfile(cache_path, output_filename)
+            os.utime(cache_path)
+        except OSError:
+            return False
+        return True
+
+    def put(self, key, source_filename):
+        """將生成的語音存入快取（先寫暫存檔再替換，避免並行寫入產生不完整的快取）"""
+        cache_path = self.path(key)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(source_filename, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning("寫入語音快取失敗: %s", e)
+
+    def prune(self):
+        """快取總大小超過上限時，從最久未使用的檔案開始刪除"""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.mp3') and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break